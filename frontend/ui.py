@@ -1,71 +1,174 @@
 # frontend/ui.py
+import json
+import os
 import streamlit as st
 import requests
-import os
-import glob
-import json
-from pathlib import Path
 
 st.set_page_config(page_title="Voice Onboarding", layout="centered")
 
 st.markdown("<h1 style='text-align: center;'>🎙️ Voice Onboarding with Alex</h1>", unsafe_allow_html=True)
 st.markdown("<p style='text-align: center; color: #666;'>Your AI twin is ready to chat.</p>", unsafe_allow_html=True)
 
-# Resolve project root and output directories regardless of current working directory
-BASE_DIR = Path(__file__).resolve().parents[1]
-TRANSCRIPTS_DIR = BASE_DIR / "output" / "transcripts"
-PERSONAS_DIR = BASE_DIR / "output" / "personas"
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+BACKEND_DOWN = "❌ Backend not running. Run: `uvicorn main:app --reload`"
+
+
+def sse_events(response):
+    """Yield the data of each server-sent event as soon as it arrives."""
+    data = []
+    for line in response.iter_lines(chunk_size=None):
+        line = line.decode("utf-8")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[6:] if line.startswith("data: ") else line[5:])
+        # Anything else is a comment (keep-alive ping) or a field we don't use
+    if data:
+        yield "\n".join(data)
+
+
+class _Uncached(Exception):
+    """Carries a result out of a cached function without it being cached."""
+
+    def __init__(self, detail):
+        self.detail = detail
+
+
+# API responses are cached across Streamlit reruns. A finished session never
+# changes, so its detail is kept until the app restarts; a running or not
+# (yet) found one is returned without caching (st.cache_data doesn't cache
+# exceptions), so it is fetched again on the next rerun.
+@st.cache_data(show_spinner=False)
+def _fetch_finished_session(session_id):
+    response = requests.get(f"{API_URL}/sessions/{session_id}", timeout=10)
+    detail = response.json() if response.status_code == 200 else None
+    if not detail or detail.get("status") == "running":
+        raise _Uncached(detail)
+    return detail
+
+
+def fetch_session(session_id):
+    try:
+        return _fetch_finished_session(session_id)
+    except _Uncached as e:
+        return e.detail
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_latest_session():
+    response = requests.get(f"{API_URL}/sessions/latest", timeout=10)
+    return response.json() if response.status_code == 200 else None
+
+
+def render_transcript(view, lines, partial=None):
+    shown = [f"**{speaker}:** {text}" for speaker, text in lines]
+    if partial:
+        shown.append(f"**🤖 Alex:** {partial} ▌")
+    view.markdown("\n\n".join(shown) if shown else "_Waiting for the conversation to start..._")
+
+
+def run_session():
+    """Start a session and render its events live; returns the session id."""
+    status = st.empty()
+    transcript_view = st.empty()
+    draft_view = st.empty()
+    lines, partial, session_id = [], None, None
+    status.info("🎧 Starting voice session... Speak to the AI. Say 'wrap up' to finish.")
+    render_transcript(transcript_view, lines)
+
+    with requests.post(f"{API_URL}/start", stream=True, timeout=(5, None)) as response:
+        if response.status_code != 200:
+            status.error(f"❌ Failed to start: {response.status_code} {response.text[:200]}")
+            return None
+        session_id = response.headers.get("X-Session-Id")
+
+        for event in sse_events(response):
+            kind, _, payload = event.partition(": ")
+            if kind == "SESSION":
+                session_id = payload
+                st.session_state.session_id = session_id
+                status.info(f"🎙️ Session `{session_id}` is live. Say 'wrap up' to finish.")
+            elif kind == "USER":
+                lines.append(("🧑 You", payload))
+            elif kind == "AI_PARTIAL":
+                partial = payload
+            elif kind == "AI":
+                lines.append(("🤖 Alex", payload))
+                partial = None
+            elif event == "INTERRUPTED":
+                if partial:
+                    lines.append(("🤖 Alex", f"{partial} …"))
+                partial = None
+            elif kind == "PERSONA_DRAFT":
+                with draft_view.container():
+                    st.markdown("### 🧩 Persona so far")
+                    st.json(json.loads(payload))
+            elif kind == "PERSONA":
+                with draft_view.container():
+                    st.markdown("### 🧠 Your Deep User Persona")
+                    st.json(json.loads(payload))
+            elif kind == "ERROR":
+                status.error(f"❌ {payload}")
+            elif event == "DONE":
+                status.success("✅ Onboarding complete! You can now view your results.")
+            render_transcript(transcript_view, lines, partial)
+
+    # A new session is now the latest one
+    fetch_latest_session.clear()
+    return session_id
+
+
+def render_results(detail):
+    turns = (detail or {}).get("transcript") or []
+    if turns:
+        transcript = "\n".join(f"{t['role']}: {t['text']}" for t in turns)
+        st.markdown("### 📜 Conversation Transcript")
+        st.text_area("", transcript, height=300)
+    else:
+        st.warning("No transcript found. Run an onboarding session first.")
+
+    persona = (detail or {}).get("persona")
+    if persona:
+        st.markdown("### 🧠 Your Deep User Persona")
+        st.json(persona)
+
+        # Creative summary
+        name = persona.get("name", "You")
+        values = ", ".join(persona.get("values", [])[:3])
+        dreams = ", ".join(persona.get("dreams", [])[:2])
+        ideal_day = persona.get("ideal_day", "a day full of surprises")
+
+        st.markdown(f"""
+        <div style="background:#f0f2f6; padding:15px; border-radius:10px; font-family:monospace;">
+        <strong>{name}</strong> — a person who values <em>{values}</em>, dreams of <em>{dreams}</em>,
+        and finds joy in <em>{ideal_day}</em>.
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.warning("No persona found. Run an onboarding session and say 'wrap up' to generate one.")
+
 
 # Start Onboarding Button
 if st.button("🎙️ Start Onboarding Session"):
-    with st.spinner("Starting voice session... Speak to the AI. Say 'wrap up' to finish."):
-        try:
-            # Call backend to start the session
-            response = requests.post("http://127.0.0.1:8000/start")
-            if response.status_code == 200:
-                st.success("✅ Onboarding complete! You can now view your results.")
-            else:
-                st.error(f"❌ Failed to start: {response.status_code}")
-        except requests.ConnectionError:
-            st.error("❌ Backend not running. Run: `uvicorn backend.main:app --reload`")
+    try:
+        run_session()
+    except requests.ConnectionError:
+        st.error(BACKEND_DOWN)
 
-# Fetch Results Button
+# Fetch Results Button: the session started from this tab, else the latest one
 if st.button("📄 Get Latest Persona & Transcript"):
     with st.spinner("Fetching latest results..."):
-
-        # Find latest transcript
-        transcript_files = sorted(glob.glob(str(TRANSCRIPTS_DIR / "*.txt")), reverse=True)
-        if transcript_files:
-            with open(transcript_files[0], "r", encoding="utf-8") as f:
-                transcript = f.read()
-            st.markdown("### 📜 Conversation Transcript")
-            st.text_area("", transcript, height=300)
-        else:
-            st.warning("No transcript found. Run an onboarding session first.")
-
-        # Find latest persona
-        persona_files = sorted(glob.glob(str(PERSONAS_DIR / "*.json")), reverse=True)
-        if persona_files:
-            with open(persona_files[0], "r", encoding="utf-8") as f:
-                persona = json.load(f)
-            st.markdown("### 🧠 Your Deep User Persona")
-            st.json(persona)
-
-            # Creative summary
-            name = persona.get("name", "You")
-            values = ", ".join(persona.get("values", [])[:3])
-            dreams = ", ".join(persona.get("dreams", [])[:2])
-            ideal_day = persona.get("ideal_day", "a day full of surprises")
-
-            st.markdown(f"""
-            <div style="background:#f0f2f6; padding:15px; border-radius:10px; font-family:monospace;">
-            <strong>{name}</strong> — a person who values <em>{values}</em>, dreams of <em>{dreams}</em>, 
-            and finds joy in <em>{ideal_day}</em>.
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.warning("No persona found. Run an onboarding session and say 'wrap up' to generate one.")
+        try:
+            session_id = st.session_state.get("session_id")
+            detail = fetch_session(session_id) if session_id else fetch_latest_session()
+        except requests.ConnectionError:
+            st.error(BACKEND_DOWN)
+            detail = None
+        render_results(detail)
 
 # Optional: Reset session state
 if st.button("🔁 Reset UI"):
+    st.session_state.pop("session_id", None)
     st.experimental_rerun()
@@ -1,11 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sse_starlette.sse import EventSourceResponse
-import sys, os
+from starlette.background import BackgroundTask
+import os
+import asyncio
+import functools
+import logging
 from onboarding import OnboardingSession
-import json
+from modules.model_pool import get_pool
+from modules.pipeline import run_blocking
+from modules.remote_audio import ENCODINGS, AudioConnection
+from modules.sessions import SessionManager, SessionLimitError
+from modules.store import get_store
+from modules.telemetry import REGISTRY, render_metrics
+from modules.stt import DEFAULT_MODEL
+from modules.tts import DEFAULT_VOICE
+from typing import Optional
 
 
+# LOG_LEVEL=DEBUG adds per-chunk and per-span detail
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger(__name__)
+
 app = FastAPI(title="Voice Onboarding API")
 
 # Allow frontend to connect
@@ -16,7 +34,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-session: OnboardingSession = None
+# Sessions share one process-wide model pool; see modules/model_pool.py
+manager = SessionManager(OnboardingSession, max_sessions=int(os.getenv("MAX_SESSIONS", "4")))
+
+ACTIVE_SESSIONS = REGISTRY.gauge("voice_active_sessions", "Sessions currently running")
+MODEL_ACTIVE = REGISTRY.gauge("voice_model_active", "Calls currently running on a shared model", ["model"])
+MODEL_WAITING = REGISTRY.gauge("voice_model_waiting", "Calls queued for a shared model", ["model"])
+AUDIO_CONNECTIONS = REGISTRY.gauge("voice_audio_connections", "Open /ws/audio connections")
+
+audio_connections = set()
+
+@app.on_event("startup")
+def preload_models():
+    # Load and warm models in the background so the port binds immediately
+    # and the first /start doesn't hit a cold model
+    if os.getenv("PRELOAD_MODELS", "1") != "0":
+        get_pool().preload_in_background(
+            whisper_model=DEFAULT_MODEL,
+            voice_path=DEFAULT_VOICE,
+            warmup=os.getenv("WARMUP_MODELS", "1") != "0",
+        )
 
 @app.get("/")
 def home():
@@ -24,30 +61,158 @@ def home():
 
 @app.post("/start")
 def start_onboarding():
-    global session
-    if session and session.is_running:
-        raise HTTPException(status_code=400, detail="Session already in progress")
-    
-    session = OnboardingSession()
+    try:
+        session = manager.create()
+    except SessionLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    # The asyncio engine keeps the event loop free while the session runs;
+    # ASYNC_PIPELINE=0 falls back to the threaded synchronous loop
+    if os.getenv("ASYNC_PIPELINE", "1") != "0":
+        events = manager.astream(session)
+    else:
+        events = manager.stream(session)
+
+    # The background task runs after the response however it ended, and frees
+    # the slot even if the client left before the stream was ever started
     return EventSourceResponse(
-        session.run(),
-        media_type="text/plain"
+        events,
+        media_type="text/plain",
+        headers={"X-Session-Id": session.session_id},
+        background=BackgroundTask(manager.release, session),
     )
 
+@app.websocket("/ws/audio")
+async def audio_session(websocket: WebSocket, encoding: str = "pcm16", sample_rate: int = 16000):
+    """A session whose microphone and speakers are the client's; see modules/remote_audio.py."""
+    await websocket.accept()
+    if encoding not in ENCODINGS:
+        await websocket.close(code=1003, reason=f"Unsupported encoding {encoding!r}")
+        return
+    if not 8000 <= sample_rate <= 96000:
+        await websocket.close(code=1003, reason=f"Unsupported sample rate {sample_rate}")
+        return
+
+    connection = AudioConnection(websocket, encoding, sample_rate)
+    audio_connections.add(connection)
+    sender = asyncio.create_task(connection.send_loop())
+    session = None
+    try:
+        try:
+            # Building a session may load models; keep that off the event loop
+            session = await run_blocking(functools.partial(
+                manager.create, audio=connection.input, sink=connection.sink))
+        except SessionLimitError as e:
+            await connection.send({"type": "error", "status": 429, "detail": str(e)})
+            return
+
+        events = asyncio.create_task(connection.forward(manager.astream(session)))
+        receiver = asyncio.create_task(connection.receive())
+        # Whichever ends first ends the session: the conversation finishing,
+        # or the client stopping / disconnecting (which cancels it)
+        await asyncio.wait({events, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        receiver.cancel()
+        if not events.done():
+            events.cancel()
+        outcome, _ = await asyncio.gather(events, receiver, return_exceptions=True)
+        if isinstance(outcome, Exception):
+            log.error("❌ Audio session failed: %s", outcome)
+            await connection.send({"type": "error", "status": 500, "detail": str(outcome)})
+        await connection.send({"type": "stats", **connection.stats()})
+    finally:
+        if session is not None:
+            manager.release(session)
+        await connection.flush()
+        connection.closed = True
+        sender.cancel()
+        audio_connections.discard(connection)
+        try:
+            await websocket.close()
+        except Exception:
+            pass  # Already gone
+
 @app.get("/persona/latest")
 def get_latest_persona():
-    persona_dir = "output/personas"
-    if not os.path.exists(persona_dir):
-        raise HTTPException(status_code=404, detail="No personas found")
-    
-    files = sorted([f for f in os.listdir(persona_dir) if f.endswith(".json")])
-    if not files:
+    latest = get_store().latest_persona()
+    if not latest:
         raise HTTPException(status_code=404, detail="No persona generated yet")
-    
-    latest = files[-1]
-    with open(f"{persona_dir}/{latest}", "r") as f:
-        return json.load(f)
+    return latest[1]
+
+@app.get("/persona/{session_id}")
+def get_persona(session_id: str):
+    session = manager.get(session_id)
+    if session and session.persona is not None:
+        return session.persona
+
+    persona = get_store().get_persona(session_id)
+    if persona is None:
+        if session or get_store().get_session(session_id):
+            raise HTTPException(status_code=404, detail="Persona not generated yet")
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return persona
+
+@app.get("/sessions")
+def list_sessions(limit: int = 20, before: Optional[int] = None):
+    return get_store().list_sessions(limit=max(1, min(limit, 100)), before=before)
+
+def _session_detail(record):
+    store = get_store()
+    return {
+        **record,
+        "transcript": store.get_transcript(record["id"]),
+        "persona": store.get_persona(record["id"]),
+    }
+
+@app.get("/sessions/latest")
+def get_latest_session():
+    record = get_store().latest_session()
+    if not record:
+        raise HTTPException(status_code=404, detail="No sessions yet")
+    return _session_detail(record)
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    record = get_store().get_session(session_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return _session_detail(record)
+
+@app.get("/persona/{session_id}/draft")
+def get_persona_draft(session_id: str):
+    session = manager.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    version, draft = session.extractor.snapshot()
+    return {"version": version, "draft": draft, "extraction": session.extractor.stats()}
 
 @app.get("/status")
 def get_status():
-    return {"running": session.is_running if session else False}
\ No newline at end of file
+    status = manager.summary()
+    status.update(get_pool().readiness())
+    status["pools"] = get_pool().stats()
+    return status
+
+@app.get("/metrics")
+def get_metrics():
+    # Point-in-time gauges are sampled on scrape; stage histograms and
+    # counters are updated as sessions run
+    ACTIVE_SESSIONS.set(manager.summary()["active_sessions"])
+    AUDIO_CONNECTIONS.set(len(audio_connections))
+    for model, stats in get_pool().stats().items():
+        MODEL_ACTIVE.set(stats["active"], model=model)
+        MODEL_WAITING.set(stats["waiting"], model=model)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/status/{session_id}/trace")
+def get_session_trace(session_id: str):
+    session = manager.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"session_id": session_id, "turn": session.trace.turn, "spans": session.trace.snapshot()}
+
+@app.get("/status/{session_id}")
+def get_session_status(session_id: str):
+    session = manager.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session.status()
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""Continuous microphone capture into a ring buffer, with on-disk session recording.
+
+One long-lived input stream per process writes every block into a
+preallocated ring. Consumers (STT, the asyncio pipeline, recorders) each
+hold a Cursor with their own read position, so nothing said between two
+listen() calls is lost as long as it's read within the ring's capacity.
+
+The PortAudio callback only copies into the ring and then publishes the new
+write position; it never takes a lock. Reads return views into the ring
+(zero-copy) unless they straddle the wrap point. A view stays valid until
+the writer laps it, i.e. for `capacity_seconds`.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Single-writer ring of float32 samples addressed by absolute position."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.written = 0  # Absolute count of samples ever written
+
+    def write(self, block):
+        n = len(block)
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        if n > first:
+            self.buffer[:n - first] = block[first:]
+        # Publish only after the samples are in place
+        self.written += n
+
+    @property
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def read(self, position, n):
+        """Samples [position, position + n); a view when contiguous, else a copy."""
+        start = position % self.capacity
+        if start + n <= self.capacity:
+            return self.buffer[start:start + n]
+        return np.concatenate([self.buffer[start:], self.buffer[:start + n - self.capacity]])
+
+
+class Cursor:
+    """A consumer's read position in a RingBuffer.
+
+    If the consumer falls more than a ring behind, the lapped samples are
+    skipped and counted in `dropped`.
+    """
+
+    def __init__(self, ring, sample_rate, position):
+        self.ring = ring
+        self.sample_rate = sample_rate
+        self.position = position
+        self.dropped = 0
+
+    def available(self):
+        return self.ring.written - self.position
+
+    def skip_to_now(self, backlog_seconds=0.0):
+        """Jump forward so at most `backlog_seconds` of unread audio remain."""
+        earliest = self.ring.written - int(backlog_seconds * self.sample_rate)
+        self.position = max(self.position, earliest, self.ring.oldest)
+
+    def catch_up(self):
+        """Skip past anything the writer has already overwritten."""
+        oldest = self.ring.oldest
+        if self.position < oldest:
+            self.dropped += oldest - self.position
+            self.position = oldest
+
+    def read(self, n):
+        """Next n samples, or None if they haven't been captured yet."""
+        self.catch_up()
+        if self.ring.written - self.position < n:
+            return None
+        samples = self.ring.read(self.position, n)
+        self.position += n
+        return samples
+
+    def read_blocking(self, n, timeout=None):
+        """Wait for the next n samples (None on timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll = max(0.001, n / self.sample_rate / 4)
+        while True:
+            samples = self.read(n)
+            if samples is not None:
+                return samples
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+
+class SessionRecording:
+    """Spills everything the microphone hears to a memory-mapped float32 file.
+
+    A background thread copies from its own cursor into an `np.memmap`
+    preallocated for `max_seconds` (sparse on disk), so resident memory
+    stays flat however long the session runs. `close()` trims the file to
+    what was recorded and writes a `.json` sidecar with the sample rate.
+    """
+
+    def __init__(self, audio, path, max_seconds=65 * 60, interval=0.5):
+        self.path = path
+        self.sample_rate = audio.sample_rate
+        self.max_samples = int(max_seconds * audio.sample_rate)
+        self.interval = interval
+        self.samples = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._data = np.memmap(path, dtype=np.float32, mode="w+", shape=(self.max_samples,))
+        self._cursor = audio.cursor()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="session-recording", daemon=True)
+        self._thread.start()
+
+    def _spill(self):
+        dropped = self._cursor.dropped
+        self._cursor.catch_up()
+        # Lapped audio stays as silence so the timeline still lines up
+        self.samples = min(self.max_samples, self.samples + self._cursor.dropped - dropped)
+        available = min(self._cursor.available(), self.max_samples - self.samples)
+        if available <= 0:
+            return
+        block = self._cursor.read(available)
+        self._data[self.samples:self.samples + len(block)] = block
+        self.samples += len(block)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._spill()
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self._spill()
+        self._data.flush()
+        del self._data
+        with open(self.path, "r+b") as f:
+            f.truncate(self.samples * 4)
+        with open(self.path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"sample_rate": self.sample_rate, "samples": self.samples,
+                       "dropped": self._cursor.dropped}, f)
+        log.info("🎙️ Recorded %.0fs of session audio to %s", self.samples / self.sample_rate, self.path)
+
+
+def load_recording(path):
+    """Memory-map a recording written by SessionRecording -> (sample_rate, audio)."""
+    with open(path + ".json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if not meta["samples"]:
+        return meta["sample_rate"], np.zeros(0, dtype=np.float32)
+    return meta["sample_rate"], np.memmap(path, dtype=np.float32, mode="r", shape=(meta["samples"],))
+
+
+class AudioInput:
+    """The process's single, long-lived microphone stream feeding a RingBuffer.
+
+    The stream starts on first use and runs until `stop()`.
+    """
+
+    def __init__(self, sample_rate=16000, frame_size=480, capacity_seconds=60):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        # A whole number of frames, so frame-sized reads never wrap
+        frames = max(1, int(capacity_seconds * sample_rate) // frame_size)
+        self.ring = RingBuffer(frames * frame_size)
+        self.overflows = 0
+        self.stream = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.stream is not None:
+                return
+            import sounddevice as sd
+
+            self.stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                                         blocksize=self.frame_size, callback=self._callback)
+            self.stream.start()
+
+    def stop(self):
+        with self._lock:
+            if self.stream is not None:
+                self.stream.stop()
+                self.stream.close()
+                self.stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status and status.input_overflow:
+            self.overflows += 1
+        self.ring.write(indata[:, 0])
+
+    def cursor(self):
+        """A new reader positioned at the current end of the stream."""
+        self.start()
+        return Cursor(self.ring, self.sample_rate, self.ring.written)
+
+    def record(self, path, max_seconds=65 * 60):
+        self.start()
+        return SessionRecording(self, path, max_seconds)
+
+    def stats(self):
+        return {
+            "seconds_captured": round(self.ring.written / self.sample_rate, 1),
+            "capacity_seconds": self.ring.capacity / self.sample_rate,
+            "overflows": self.overflows,
+        }
+
+
+_audio = None
+_audio_lock = threading.Lock()
+
+
+def get_audio_input():
+    """Return the process-wide AudioInput (ring size from AUDIO_RING_SECONDS)."""
+    global _audio
+    with _audio_lock:
+        if _audio is None:
+            _audio = AudioInput(capacity_seconds=float(os.getenv("AUDIO_RING_SECONDS", "60")))
+        return _audio
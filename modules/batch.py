@@ -0,0 +1,224 @@
+"""Offline reprocessing of archived sessions across a process pool.
+
+Each input is one session: a recording (a WAV file, or a .f32 session
+recording from modules/audio_buffer.py), which is transcribed with
+Whisper, or a saved transcript (.txt with "User: ..." / "AI: ..." lines).
+Worker processes load Whisper once each and build the persona; the parent is the
+only writer to the SessionStore, so results land in the same database the
+API reads. Inputs that already have a complete session are skipped, which
+makes an interrupted run resumable.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from modules.audio_buffer import load_recording
+from modules.store import get_store
+from modules.utils import generate_session_id, load_wav
+
+log = logging.getLogger(__name__)
+
+SOURCE_PREFIX = "batch:"
+INPUT_SUFFIXES = (".wav", ".f32", ".txt")
+AUDIO_SUFFIXES = (".wav", ".f32")
+
+
+def discover(inputs):
+    """Expand files and directories into a sorted, de-duplicated list of inputs."""
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found.extend(p for p in sorted(path.rglob("*")) if p.suffix.lower() in INPUT_SUFFIXES)
+        elif path.suffix.lower() in INPUT_SUFFIXES:
+            found.append(path)
+
+    # A .txt next to a recording of the same name is its reference
+    # transcript, not a separate session
+    recordings = {p.with_suffix("") for p in found if p.suffix.lower() in AUDIO_SUFFIXES}
+    found = [p for p in found if p.suffix.lower() in AUDIO_SUFFIXES or p.with_suffix("") not in recordings]
+    return list(dict.fromkeys(p.resolve() for p in found))
+
+
+def source_for(path):
+    return f"{SOURCE_PREFIX}{Path(path).resolve()}"
+
+
+def parse_transcript(text):
+    """Split a saved transcript into (role, text) turns."""
+    turns = []
+    for line in text.splitlines():
+        role, sep, content = line.partition(": ")
+        if sep and role in ("User", "AI"):
+            turns.append((role, content.strip()))
+        elif line.strip() and turns:
+            # Continuation of a wrapped line
+            turns[-1] = (turns[-1][0], f"{turns[-1][1]} {line.strip()}")
+    return turns
+
+
+def transcribe_recording(path, model):
+    """Transcribe a whole recording into one User turn per Whisper segment."""
+    if Path(path).suffix.lower() == ".f32":
+        # Raw session recording from modules/audio_buffer.py (16 kHz)
+        audio = np.asarray(load_recording(str(path))[1])
+    else:
+        audio = load_wav(path, 16000)
+    result = model.transcribe(audio, fp16=False)
+    segments = result.get("segments") or [{"text": result["text"]}]
+    return [("User", s["text"].strip()) for s in segments if s["text"].strip()]
+
+
+# -- worker processes ------------------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(whisper_model, llm_slots):
+    _worker.update(whisper_model=whisper_model, llm_slots=llm_slots)
+
+
+class _BoundedLLM:
+    """LLM wrapper that takes a slot from a semaphore shared by all workers."""
+
+    def __init__(self, llm, slots):
+        self.llm = llm
+        self.slots = slots
+
+    def generate(self, prompt):
+        with self.slots:
+            return self.llm.generate(prompt)
+
+
+def _whisper():
+    if "whisper" not in _worker:
+        from modules.model_pool import get_pool
+
+        _worker["whisper"] = get_pool().whisper(_worker["whisper_model"])
+    return _worker["whisper"]
+
+
+def _builder():
+    if "builder" not in _worker:
+        from modules.llm import create_bot
+        from modules.persona_builder import PersonaBuilder
+
+        _worker["builder"] = PersonaBuilder(llm=_BoundedLLM(create_bot(), _worker["llm_slots"]))
+    return _worker["builder"]
+
+
+def process_one(path):
+    """Worker entry point: transcript and persona for one input (never raises)."""
+    path = Path(path)
+    start = time.perf_counter()
+    try:
+        if path.suffix.lower() in AUDIO_SUFFIXES:
+            turns = transcribe_recording(path, _whisper())
+        else:
+            turns = parse_transcript(path.read_text(encoding="utf-8"))
+        transcribed = time.perf_counter()
+
+        transcript = "\n".join(f"{role}: {text}" for role, text in turns)
+        persona = _builder().build(transcript) if turns else {"error": "Empty transcript"}
+        return {
+            "path": str(path),
+            "turns": turns,
+            "persona": persona,
+            "transcribe_seconds": transcribed - start,
+            "persona_seconds": time.perf_counter() - transcribed,
+        }
+    except Exception as e:
+        return {"path": str(path), "error": f"{type(e).__name__}: {e}"}
+
+
+# -- parent process --------------------------------------------------------------
+
+class BatchProcessor:
+    """Runs process_one() over many inputs and saves the results to the store.
+
+    `workers` processes each hold their own Whisper model; `llm_concurrency`
+    caps LLM calls in flight across all of them (PersonaBuilder fans out
+    long transcripts, so this is the real limit on API load).
+    """
+
+    def __init__(self, store=None, whisper_model="small", workers=2, llm_concurrency=2, force=False):
+        self.store = store or get_store()
+        self.whisper_model = whisper_model
+        self.workers = workers
+        self.llm_concurrency = llm_concurrency
+        self.force = force
+
+    def pending(self, paths):
+        """Inputs without a complete session yet (all of them with force=True)."""
+        if self.force:
+            return list(paths)
+        return [p for p in paths if not self.store.find_by_source(source_for(p), status="complete")]
+
+    def save(self, result):
+        """Write one worker result as a session; returns its id and status."""
+        session_id = generate_session_id()
+        self.store.create_session(session_id, source=source_for(result["path"]))
+        for role, text in result["turns"]:
+            self.store.append_turn(session_id, role, text)
+
+        persona = result["persona"]
+        if "error" in persona:
+            status = "failed"
+        else:
+            status = "complete"
+            self.store.save_persona(session_id, persona)
+        self.store.finish_session(session_id, status)
+        return session_id, status
+
+    def run(self, inputs, on_result=None):
+        """Process `inputs` (files and/or directories); returns a summary dict.
+
+        `on_result(result, summary)` is called in the parent after each input.
+        """
+        paths = discover(inputs)
+        todo = self.pending(paths)
+        summary = {
+            "inputs": len(paths),
+            "skipped": len(paths) - len(todo),
+            "complete": 0,
+            "failed": 0,
+            "errors": 0,
+            "elapsed_seconds": 0.0,
+            "sessions_per_min": 0.0,
+        }
+        if not todo:
+            return summary
+
+        # spawn rather than fork: torch and the Groq client don't survive forking
+        context = multiprocessing.get_context("spawn")
+        llm_slots = context.Semaphore(self.llm_concurrency)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(todo)), mp_context=context,
+                                 initializer=_init_worker, initargs=(self.whisper_model, llm_slots)) as pool:
+            futures = [pool.submit(process_one, str(p)) for p in todo]
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    if "error" in result:
+                        summary["errors"] += 1
+                        log.error("❌ %s: %s", result["path"], result["error"])
+                    else:
+                        result["session_id"], status = self.save(result)
+                        result["status"] = status
+                        summary[status] += 1
+
+                    elapsed = time.perf_counter() - start
+                    done = summary["complete"] + summary["failed"] + summary["errors"]
+                    summary["elapsed_seconds"] = round(elapsed, 2)
+                    summary["sessions_per_min"] = round(60 * done / elapsed, 2) if elapsed else 0.0
+                    if on_result:
+                        on_result(result, summary)
+            except KeyboardInterrupt:
+                # Everything saved so far stays; a rerun picks up the rest
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        return summary
@@ -3,15 +3,21 @@ import random
 import re
 from modules.stt import STT
 from modules.tts import TTS
-from modules.llm import MistralBot
+from modules.llm import reply_stream
+from modules.model_pool import get_pool
+from modules.memory import ConversationMemory
+from modules.segmenter import stream_sentences
+from modules import phrases
+from modules.question_index import load_or_build
 import json
+import os
 
 
 class ConversationEngine:
-    def __init__(self):
-        self.stt = STT()
-        self.tts = TTS()
-        self.llm = MistralBot()
+    def __init__(self, llm=None, stt=None, tts=None, question_index=None):
+        self.stt = stt or STT()
+        self.tts = tts or TTS()
+        self.llm = llm or get_pool().llm()
         self.memory = []
         self.start_time = time.time()
         self.question_count = 0
@@ -21,14 +27,24 @@ class ConversationEngine:
         with open("prompts/question_bank.json", "r", encoding="utf-8") as f:
             self.questions = json.load(f)
 
+        # Semantic index over the personalized questions (built once, memory-mapped)
+        self.question_index = question_index or load_or_build("prompts/question_bank.json")
+
         with open("prompts/system_prompt.txt", "r", encoding="utf-8") as f:
             self.system_prompt = f.read()
 
-        with open("prompts/humor_templates.txt", "r", encoding="utf-8") as f:
+        with open("prompts/humor_template.txt", "r", encoding="utf-8") as f:
             self.humor_templates = self._parse_humor_sections(f.read())
 
+        # Token-budgeted prompt context; self.memory keeps the full (user, ai) history
+        self.context = ConversationMemory(
+            self.llm, self.system_prompt,
+            recent_tokens=int(os.getenv("MEMORY_RECENT_TOKENS", "1200")),
+            summary_tokens=int(os.getenv("MEMORY_SUMMARY_TOKENS", "300")),
+        )
+
     def _parse_humor_sections(self, content: str) -> dict:
-        """Parse humor_templates.txt into labeled sections."""
+        """Parse humor_template.txt into labeled sections."""
         sections = {}
         current_section = None
         for line in content.splitlines():
@@ -68,40 +84,34 @@ class ConversationEngine:
         return ""
 
     def get_context_prompt(self):
-        # Get recent conversation history
-        history = "\n".join([f"User: {u}\nAI: {a}" for u, a in self.memory[-5:]])
-
         # Get humor hint based on latest user input
         last_user = self.memory[-1][0] if self.memory else ""
         humor_hint = self._get_relevant_humor_hint(last_user)
 
-        # Build full prompt
-        prompt_parts = [self.system_prompt]
-
+        # The hint changes per turn, so it goes after the history to keep
+        # the system prompt prefix identical between turns
+        guidance = ""
         if humor_hint:
-            prompt_parts.append(f"\n# HUMOR GUIDANCE\nWhen appropriate, respond with a tone like this:\n\"{humor_hint}\"")
-
-        prompt_parts.append(f"\nConversation so far:\n{history}\nUser:")
+            guidance = f"(HUMOR GUIDANCE: when appropriate, respond with a tone like this: \"{humor_hint}\")"
 
-        return "\n".join(prompt_parts)
+        return self.context.prompt(extra=guidance)
 
     def should_ask_personalized(self):
-        recent = " ".join([m[0] for m in self.memory[-3:]]).lower()
-        for q in self.questions:
-            if q["type"] == "personalized" and q["trigger"] in recent and q["question"] not in self.answered_core:
-                return q["question"]
-        return None
+        """Nearest unasked personalized question for the recent user turns, as (position, question)."""
+        recent = " ".join([m[0] for m in self.memory[-3:]])
+        return self.question_index.match(recent, exclude=self.answered_core)
 
     def run(self):
-        self.tts.speak("Hey there! I'm Alex — your witty onboarding buddy. Ready to dive into a fun, 40-minute chat to build your personal AI twin? No pressure, just vibes. Let's go!")
+        self.tts.speak(phrases.ENGINE_INTRO, cache=True)
 
         while self.duration() < 40 * 60 or self.question_count < 15:
             # Listen
-            user_text = self.stt.transcribe()
+            user_text = self.stt.listen(duration=15)
             if not user_text:
                 continue
 
             self.memory.append((user_text, ""))
+            self.context.add(f"User: {user_text}")
 
             # Generate prompt (now with humor!)
             prompt = self.get_context_prompt()
@@ -109,13 +119,22 @@ class ConversationEngine:
             # Check for personalized question
             p_q = self.should_ask_personalized()
             if p_q and random.random() < 0.7:
-                ai_response = p_q
+                position, question = p_q
+                self.answered_core.add(position)
+                ai_response = question["question"]
+                self.tts.speak(ai_response, cache=True)
             else:
-                ai_response = self.llm.generate(prompt)
-
-            # Speak
-            self.tts.speak(ai_response)
+                # Speak each sentence as soon as the LLM finishes it
+                speech = self.tts.speak_async()
+                spoken = []
+                for sentence in stream_sentences(reply_stream(self.llm, prompt)):
+                    speech.feed(sentence)
+                    spoken.append(sentence)
+                speech.finish()
+                ai_response = " ".join(spoken)
+                speech.wait()
             self.memory[-1] = (user_text, ai_response)
+            self.context.add(f"AI: {ai_response}")
             self.question_count += 1
 
             # Check exit cue
@@ -124,7 +143,8 @@ class ConversationEngine:
 
             time.sleep(1)
 
-        self.tts.speak("That was awesome! Let me generate your deep user persona now.")
+        self.tts.speak(phrases.ENGINE_WRAP_UP, cache=True)
+        self.context.close()
         return self.get_transcript()
 
     def duration(self):
@@ -0,0 +1,131 @@
+"""Stand-ins for the microphone, speakers, Whisper and Piper.
+
+They let the session loop run without audio hardware or model downloads,
+for benchmarks (scripts/bench_latency.py) and offline experiments. The LLM
+stand-in is modules.llm.StubBot.
+"""
+import time
+from pathlib import Path
+
+import numpy as np
+
+from modules.utils import load_wav
+from modules.vad import EnergyVAD, endpoint
+
+
+class WavInput:
+    """Replays WAV files as successive microphone turns for STT(source=...).
+
+    Each capture runs the real VAD endpointing over the next file plus
+    `tail_silence` seconds. With `realtime=True` it also sleeps for as long
+    as live capture would have taken. `capture_seconds` holds the simulated
+    capture time of the last turn.
+    """
+
+    def __init__(self, paths, vad_config=None, tail_silence=1.0, realtime=False):
+        self.paths = [Path(p) for p in paths]
+        self.vad_config = vad_config or {}
+        self.tail_silence = tail_silence
+        self.realtime = realtime
+        self.position = 0
+        self.capture_seconds = 0.0
+        self.current = None
+
+    @property
+    def exhausted(self):
+        return self.position >= len(self.paths)
+
+    def capture(self, max_duration=15, sample_rate=16000):
+        if self.exhausted:
+            self.capture_seconds = 0.0
+            return np.zeros(0, dtype=np.float32)
+
+        self.current = self.paths[self.position]
+        self.position += 1
+        speech = load_wav(self.current, sample_rate)
+        audio = np.concatenate([speech, np.zeros(int(self.tail_silence * sample_rate), dtype=np.float32)])
+        audio = audio[:int(max_duration * sample_rate)]
+
+        vad = EnergyVAD(sample_rate=sample_rate, **self.vad_config)
+        trimmed, stop_at = endpoint(audio, vad)
+        self.capture_seconds = stop_at / sample_rate
+        if self.realtime:
+            time.sleep(self.capture_seconds)
+        return trimmed
+
+
+class ScriptedWhisper:
+    """Whisper stand-in that returns scripted text with a configurable delay.
+
+    Text comes from the `.txt` file next to the WAV currently being played
+    by `source` (if any), otherwise from `lines` in order.
+    """
+
+    def __init__(self, lines=None, source=None, latency=0.0, realtime_factor=0.0):
+        self.lines = list(lines or [])
+        self.source = source
+        self.latency = latency
+        self.realtime_factor = realtime_factor  # seconds of compute per second of audio
+        self._next = 0
+
+    def transcribe(self, audio, **kwargs):
+        time.sleep(self.latency + self.realtime_factor * len(audio) / 16000)
+        if self.source is not None and self.source.current is not None:
+            sidecar = self.source.current.with_suffix(".txt")
+            if sidecar.exists():
+                return {"text": sidecar.read_text(encoding="utf-8").strip()}
+        if self._next < len(self.lines):
+            self._next += 1
+            return {"text": self.lines[self._next - 1]}
+        return {"text": "Sounds good."}
+
+
+class _Chunk:
+    def __init__(self, audio, sample_rate):
+        self.audio_float_array = audio
+        self.sample_rate = sample_rate
+
+
+class SilentVoice:
+    """Piper stand-in: yields silent audio sized like real speech, per sentence.
+
+    `realtime_factor` is synthesis compute per second of produced audio.
+    """
+
+    def __init__(self, sample_rate=22050, words_per_second=2.5, realtime_factor=0.05):
+        self.sample_rate = sample_rate
+        self.words_per_second = words_per_second
+        self.realtime_factor = realtime_factor
+
+    def synthesize(self, text, *args, **kwargs):
+        for sentence in [s for s in text.replace("!", ".").replace("?", ".").split(".") if s.strip()]:
+            seconds = max(0.3, len(sentence.split()) / self.words_per_second)
+            time.sleep(seconds * self.realtime_factor)
+            yield _Chunk(np.zeros(int(seconds * self.sample_rate), dtype=np.float32), self.sample_rate)
+
+
+class NullSink:
+    """Audio sink that discards samples (optionally at playback speed)."""
+
+    realtime = False
+
+    def open(self, sample_rate):
+        self.sample_rate = sample_rate
+
+    def write(self, block):
+        if self.realtime:
+            time.sleep(len(block) / self.sample_rate)
+
+    def close(self, abort=False):
+        pass
+
+
+class RealtimeNullSink(NullSink):
+    realtime = True
+
+
+class NoQuestionIndex:
+    """Question index stand-in that never suggests a question."""
+
+    def match(self, text, **kwargs):
+        return None
@@ -1,14 +1,42 @@
 # modules/llm.py
-from phi.agent import Agent
-from phi.model.groq import Groq
 from dotenv import load_dotenv
+import http.client
+import json
+import logging
 import os
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+from modules import phrases
+from modules.llm_client import LLMClient, LLMHTTPError
+
+log = logging.getLogger(__name__)
 
 # Load environment variables from .env
 load_dotenv()
 
+_groq_clients = {}
+_groq_lock = threading.Lock()
+
+
+def _groq_client(api_key):
+    """One Groq SDK client per key and process, so HTTP connections are reused."""
+    with _groq_lock:
+        if api_key not in _groq_clients:
+            # groq is imported lazily so importing this module stays cheap
+            from groq import Groq
+
+            log.info("🧠 Connecting to Groq cloud LLM...")
+            # Retries are LLMClient's job; the SDK's own would multiply them
+            _groq_clients[api_key] = Groq(api_key=api_key, max_retries=0)
+        return _groq_clients[api_key]
+
+
 class MistralBot:
-    def __init__(self, model_id="llama-3.3-70b-versatile"):
+    """Groq-hosted chat model. Raises on failure; create_bot() wraps it in an LLMClient."""
+
+    def __init__(self, model_id="llama-3.3-70b-versatile", timeout=60.0):
         # Get API key from .env
         self.api_key = os.getenv("GROQ_API_KEY")
         if not self.api_key:
@@ -16,21 +44,194 @@ class MistralBot:
                 "GROQ_API_KEY not found in .env file. "
                 "Please add it to your .env file and try again."
             )
+        self.model_id = model_id
+        self.timeout = timeout  # Per HTTP request
+        self.client = _groq_client(self.api_key)
 
-        print("🧠 Connecting to Groq cloud LLM...")
-        self.agent = Agent(
-            model=Groq(
-                id=model_id,
-                api_key=self.api_key  # Pass key explicitly
-            ),
+    def _create(self, prompt, stream):
+        return self.client.chat.completions.create(
+            model=self.model_id,
+            messages=[{"role": "user", "content": prompt}],
+            stream=stream,
+            timeout=self.timeout,
         )
-        print("✅ Connected to Groq!")
 
     def generate(self, prompt):
         """Generate a response from the LLM."""
+        response = self._create(prompt, stream=False)
+        return (response.choices[0].message.content or "").strip()
+
+    def generate_stream(self, prompt):
+        """Stream the response from the LLM, yielding text tokens as they arrive."""
+        stream = self._create(prompt, stream=True)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Hands the connection back to the pool even if the caller stops early
+            stream.close()
+
+
+class OpenAICompatibleBot:
+    """Any server speaking the OpenAI chat completions API.
+
+    Meant as a fallback or stand-in: a local llama.cpp / Ollama / vLLM
+    server, or scripts/stub_llm_server.py for offline tests. Uses the
+    standard library only, with one keep-alive connection per thread.
+    """
+
+    def __init__(self, base_url, model="local", timeout=60.0, api_key=None):
+        url = urlsplit(base_url)
+        self.https = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port
+        self.path = url.path.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.timeout = timeout
+        self.api_key = api_key
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _discard_connection(self):
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            conn.close()
+
+    def _post(self, prompt, stream):
+        body = json.dumps({"model": self.model, "stream": stream,
+                           "messages": [{"role": "user", "content": prompt}]})
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        conn = self._connection()
+        try:
+            conn.request("POST", self.path, body, headers)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            # Includes a keep-alive connection the server already closed
+            self._discard_connection()
+            raise
+        if response.status != 200:
+            detail = response.read().decode("utf-8", errors="replace")[:200]
+            raise LLMHTTPError(response.status, detail, {k.lower(): v for k, v in response.getheaders()})
+        return response
+
+    def generate(self, prompt):
+        response = self._post(prompt, stream=False)
+        reply = json.loads(response.read())
+        return (reply["choices"][0]["message"].get("content") or "").strip()
+
+    def generate_stream(self, prompt):
+        response = self._post(prompt, stream=True)
+        finished = False
         try:
-            response = self.agent.run(prompt)
-            return response.content.strip()
-        except Exception as e:
-            print(f"❌ Error generating response: {e}")
-            return "I'm having trouble thinking right now. Let's try again."
+            # Server-sent events: "data: {chunk}" lines, ending with "data: [DONE]"
+            for line in response:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+            response.read()
+            finished = True
+        finally:
+            if not finished:
+                # A half-read response can't be reused
+                self._discard_connection()
+
+
+class StubBot:
+    """Local, deterministic stand-in for MistralBot (no network, no API key).
+
+    Replies are picked from `replies` by a hash of the prompt and streamed
+    word by word, with optional latencies to mimic a hosted model:
+    `prompt_token_latency` per ~4 prompt characters models prefill cost.
+    """
+
+    DEFAULT_REPLIES = [
+        "Ha, I love that. Tell me a little more about how that started for you?",
+        "That's a great answer. What does a really good day look like for you?",
+        "Interesting! If you had a free weekend with zero obligations, how would you spend it?",
+    ]
+
+    def __init__(self, replies=None, first_token_latency=0.0, token_latency=0.0, prompt_token_latency=0.0):
+        self.replies = replies or self.DEFAULT_REPLIES
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+
+    def _reply_for(self, prompt):
+        index = zlib.crc32(prompt.encode("utf-8")) % len(self.replies)
+        return self.replies[index]
+
+    def generate(self, prompt):
+        return "".join(self.generate_stream(prompt)).strip()
+
+    def generate_stream(self, prompt):
+        reply = self._reply_for(prompt)
+        delay = self.first_token_latency + self.prompt_token_latency * len(prompt) / 4
+        if delay:
+            time.sleep(delay)
+        for i, word in enumerate(reply.split(" ")):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield word if i == 0 else f" {word}"
+
+
+def _backend(spec):
+    """'groq', 'stub', or the base URL of an OpenAI-compatible server."""
+    if spec.lower() == "stub":
+        return StubBot()
+    if spec.lower() == "groq":
+        return MistralBot(timeout=float(os.getenv("LLM_TIMEOUT", "60")))
+    if spec.startswith(("http://", "https://")):
+        return OpenAICompatibleBot(spec, model=os.getenv("LLM_LOCAL_MODEL", "local"),
+                                   timeout=float(os.getenv("LLM_TIMEOUT", "60")))
+    raise ValueError(f"Unknown LLM backend {spec!r}")
+
+
+def create_bot():
+    """Build the configured LLM client.
+
+    `LLM_BACKEND` is the primary backend ("groq", "stub" to run fully
+    offline, or an OpenAI-compatible base URL) and `LLM_FALLBACK` an
+    optional second one in the same format.
+    """
+    fallback = os.getenv("LLM_FALLBACK")
+    return LLMClient(
+        _backend(os.getenv("LLM_BACKEND", "groq")),
+        fallback=_backend(fallback) if fallback else None,
+        first_token_timeout=float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "10")),
+        timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+        retries=int(os.getenv("LLM_RETRIES", "2")),
+        hedge_after=float(os.getenv("LLM_HEDGE_MS", "0")) / 1000 or None,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")) or None,
+    )
+
+
+def reply_stream(llm, prompt):
+    """generate_stream() for spoken replies: a failed call ends in an apology instead of an error."""
+    stream = llm.generate_stream(prompt)
+    yielded = False
+    try:
+        for token in stream:
+            yielded = True
+            yield token
+    except Exception as e:
+        log.error("❌ Error generating response: %s", e)
+        yield f" {phrases.LLM_APOLOGY}" if yielded else phrases.LLM_APOLOGY
+    finally:
+        stream.close()
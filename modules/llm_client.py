@@ -0,0 +1,315 @@
+"""Resilient client layer in front of the LLM backends.
+
+Backends (modules/llm.py) only know how to stream one completion and raise
+when that fails. LLMClient wraps one with what every caller needs:
+
+- a deadline for the first token and one for the whole reply;
+- retries with exponential backoff and jitter on transient errors
+  (timeouts, dropped connections, 429 and 5xx), honouring Retry-After;
+- optional hedging: if the first token hasn't arrived `hedge_after`
+  seconds after the request started, an identical second request is raced
+  against it and the slower one is dropped;
+- a concurrency and requests-per-minute limit matching the provider's;
+- a fallback backend (a local model or a stand-in server) once the primary
+  has given up.
+
+Nothing is retried or hedged after the first token has been handed to the
+caller, so a reply never contains text twice.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from modules.model_pool import BoundedWorker, ModelBusyError
+from modules.telemetry import REGISTRY, bind_context, observe, span
+
+log = logging.getLogger(__name__)
+
+LLM_EVENTS = REGISTRY.counter(
+    "voice_llm_events_total", "LLM client requests, retries, hedges, fallbacks and failures",
+    ["backend", "event"],
+)
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """The LLM could not produce a reply."""
+
+
+class LLMTimeout(LLMError):
+    """A deadline passed before the (next) token arrived."""
+
+
+class LLMHTTPError(LLMError):
+    """Non-success HTTP response from an LLM server."""
+
+    def __init__(self, status_code, message, headers=None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def is_retryable(exc):
+    """Whether another attempt at the same backend could succeed."""
+    if isinstance(exc, (LLMTimeout, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRY_STATUSES
+    # SDK transport errors (groq.APIConnectionError, APITimeoutError) carry no status
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(exc):
+    """Seconds asked for by a Retry-After header on the error, if any."""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket allowing `per_minute` requests a minute, in bursts of up to `burst`."""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class _Attempt:
+    """One streaming request on a daemon thread, reporting into a shared queue.
+
+    Events are (attempt, kind, value) with kind "started" (admitted past the
+    limiter), "token", "done" or "error".
+    """
+
+    def __init__(self, llm, prompt, events, admit):
+        self.started_at = None
+        self.cancelled = threading.Event()
+        threading.Thread(target=bind_context(self._run), args=(llm, prompt, events, admit),
+                         name="llm-attempt", daemon=True).start()
+
+    def _run(self, llm, prompt, events, admit):
+        try:
+            with admit():
+                self.started_at = time.monotonic()
+                events.put((self, "started", None))
+                stream = llm.generate_stream(prompt)
+                try:
+                    for token in stream:
+                        if self.cancelled.is_set():
+                            return
+                        events.put((self, "token", token))
+                finally:
+                    stream.close()
+            events.put((self, "done", None))
+        except Exception as e:
+            events.put((self, "error", e))
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class LLMClient:
+    """Drop-in LLM (generate / generate_stream) with deadlines, retries, hedging and fallback.
+
+    One client is meant to be shared by every session in the process (see
+    ModelPool.llm()), so `max_concurrency` and `requests_per_minute` apply
+    to all of them together. Hedges count against both limits and are only
+    sent while a concurrency slot is free. The fallback gets a single
+    attempt, without limits or hedging. When everything fails, LLMError is
+    raised; see modules.llm.reply_stream for spoken replies.
+    """
+
+    def __init__(self, llm, fallback=None, name="llm", first_token_timeout=10.0, timeout=60.0,
+                 retries=2, backoff=0.5, max_backoff=8.0, hedge_after=None,
+                 max_concurrency=8, max_queue=32, requests_per_minute=None):
+        self.llm = llm
+        self.fallback = fallback
+        self.name = name
+        self.first_token_timeout = first_token_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.worker = BoundedWorker(name, max_concurrency, max_queue, timeout)
+        self.rate = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+        self.requests = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _count(self, field, backend, event):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+        LLM_EVENTS.inc(backend=backend, event=event)
+
+    @contextmanager
+    def _admit(self):
+        with self.worker.slot():
+            if self.rate is not None and not self.rate.acquire(self.timeout):
+                raise ModelBusyError(f"{self.name} rate limit: no request slot within {self.timeout}s")
+            yield
+
+    def _can_hedge(self):
+        stats = self.worker.stats()
+        return stats["active"] < stats["workers"]
+
+    def _delay(self, attempt, error):
+        # Exponential backoff with jitter, unless the server said how long to wait
+        base = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        delay = base / 2 + random.uniform(0, base / 2)
+        asked = retry_after(error)
+        return min(self.max_backoff, max(delay, asked)) if asked is not None else delay
+
+    def _request(self, llm, label, prompt, primary):
+        """Tokens of one request (and its hedge); raises on error or deadline."""
+        events = queue.Queue()
+        admit = self._admit if primary else nullcontext
+        attempts = [_Attempt(llm, prompt, events, admit)]
+        # Until the request is admitted only the overall timeout applies
+        deadline = time.monotonic() + self.timeout
+        hedge_at = None
+        winner = None
+        errors = 0
+        try:
+            while True:
+                now = time.monotonic()
+                wait = deadline - now if hedge_at is None else min(deadline, hedge_at) - now
+                try:
+                    attempt, kind, value = events.get(timeout=max(0.0, wait))
+                except queue.Empty:
+                    if hedge_at is not None and time.monotonic() >= hedge_at:
+                        hedge_at = None
+                        if self._can_hedge():
+                            self._count("hedged", label, "hedge")
+                            attempts.append(_Attempt(llm, prompt, events, admit))
+                        continue
+                    what = "next token" if winner else "first token"
+                    raise LLMTimeout(f"{label}: no {what} within the deadline")
+
+                if winner is None:
+                    if kind == "started":
+                        if attempt is attempts[0]:
+                            deadline = attempt.started_at + self.first_token_timeout
+                            if primary and self.hedge_after is not None:
+                                hedge_at = attempt.started_at + self.hedge_after
+                        continue
+                    if kind == "error":
+                        errors += 1
+                        if errors == len(attempts):
+                            raise value
+                        continue
+                    # First token (or an empty reply) decides the race
+                    winner = attempt
+                    hedge_at = None
+                    deadline = attempt.started_at + self.timeout
+                    for other in attempts:
+                        if other is not winner:
+                            other.cancel()
+                    if winner is not attempts[0]:
+                        self._count("hedge_wins", label, "hedge_won")
+                elif attempt is not winner:
+                    continue
+
+                if kind == "token":
+                    yield value
+                elif kind == "done":
+                    return
+                elif kind == "error":
+                    raise value
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def _tokens(self, prompt):
+        self._count("requests", self.name, "request")
+        backends = [(self.llm, self.name, True)]
+        if self.fallback is not None:
+            backends.append((self.fallback, f"{self.name}:fallback", False))
+
+        error = None
+        for llm, label, primary in backends:
+            if not primary:
+                self._count("fallbacks", label, "fallback")
+                log.warning("↪️ Falling back to %s after: %s", label, error)
+            for attempt in range(self.retries + 1 if primary else 1):
+                if attempt:
+                    delay = self._delay(attempt, error)
+                    self._count("retried", label, "retry")
+                    log.warning("🔁 %s failed (%s); retry %d in %.2fs", label, error, attempt, delay)
+                    time.sleep(delay)
+                yielded = False
+                try:
+                    for token in self._request(llm, label, prompt, primary):
+                        yielded = True
+                        yield token
+                    return
+                except Exception as e:
+                    error = e
+                    LLM_EVENTS.inc(backend=label, event="timeout" if isinstance(e, LLMTimeout) else "error")
+                    if yielded:
+                        self._count("failures", self.name, "failed")
+                        raise LLMError(f"{label} failed mid-reply: {e}") from e
+                    if not is_retryable(e):
+                        break
+
+        self._count("failures", self.name, "failed")
+        raise LLMError(f"{self.name} unavailable: {error}") from error
+
+    def generate(self, prompt):
+        """The whole reply as one string."""
+        with span("llm.generate"):
+            return "".join(self._tokens(prompt)).strip()
+
+    def generate_stream(self, prompt):
+        """Yield text tokens as they arrive."""
+        with span("llm.generate_stream"):
+            start = time.perf_counter()
+            first = True
+            for token in self._tokens(prompt):
+                if first:
+                    observe("llm.first_token", time.perf_counter() - start)
+                    first = False
+                yield token
+
+    def stats(self):
+        stats = self.worker.stats()
+        with self._lock:
+            stats.update(
+                requests=self.requests,
+                retries=self.retried,
+                hedges=self.hedged,
+                hedge_wins=self.hedge_wins,
+                fallbacks=self.fallbacks,
+                failures=self.failures,
+            )
+        return stats
@@ -0,0 +1,168 @@
+"""Token-budgeted conversation memory for building LLM prompts.
+
+A prompt is made of three parts:
+
+- a static prefix (the system prompt), byte-identical on every turn so the
+  provider's prompt cache can reuse it;
+- a rolling summary of older turns, rewritten on a background thread
+  whenever the verbatim part outgrows its budget;
+- the most recent turns verbatim.
+
+The prompt therefore stays roughly constant in size however long the
+session runs, without dropping what was said early on.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.persona_builder import estimate_tokens
+from modules.telemetry import REGISTRY, bind_context
+
+log = logging.getLogger(__name__)
+
+PROMPT_TOKENS = REGISTRY.histogram(
+    "voice_prompt_tokens", "Estimated prompt tokens per LLM turn",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+
+SUMMARY_PROMPT = """You maintain a running summary of a voice onboarding conversation between an AI host and a user.
+
+Current summary:
+{summary}
+
+New turns to fold in:
+{turns}
+
+Write the updated summary in at most {words} words. Keep every concrete fact about the user (names, places, work, family, hobbies, goals, values, opinions, jokes they enjoyed) and what has already been asked, so nothing gets asked twice. Plain prose, no preamble.
+
+Updated summary:"""
+
+
+class ConversationMemory:
+    """Keeps a prompt within `recent_tokens` of verbatim turns plus a summary.
+
+    When the verbatim turns exceed `recent_tokens`, the oldest of them are
+    handed to the LLM to be folded into the summary (down to half the budget,
+    keeping at least `min_recent_lines`). Until that finishes they stay in
+    the prompt; if they would push it past twice the budget the oldest are
+    left out meanwhile.
+    """
+
+    def __init__(self, llm, prefix, recent_tokens=1200, summary_tokens=300, min_recent_lines=4):
+        self.llm = llm
+        self.prefix = prefix
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.min_recent_lines = min_recent_lines
+
+        self.lines = []
+        self.summary = ""
+        self.summarized = 0  # lines[:summarized] are folded into the summary
+        self.summary_updates = 0
+        self.summary_seconds = 0.0
+        self.prompts = 0
+        self.last_prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+        self._prefix_tokens = estimate_tokens(prefix)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+        self._pending = None
+
+    def add(self, line):
+        """Append a transcript line ("User: ..." / "AI: ...")."""
+        with self._lock:
+            self.lines.append(line)
+            cut = self._summary_cut()
+            if cut is None or (self._pending is not None and not self._pending.done()):
+                return
+            turns = self.lines[self.summarized:cut]
+            summary = self.summary
+        self._pending = self._executor.submit(bind_context(self._summarize), summary, turns, cut)
+
+    def _summary_cut(self):
+        recent = self.lines[self.summarized:]
+        if sum(estimate_tokens(l) for l in recent) <= self.recent_tokens:
+            return None
+        # Summarize down to half the budget so updates come in batches
+        keep, size = 0, 0
+        for line in reversed(recent):
+            cost = estimate_tokens(line)
+            if keep >= self.min_recent_lines and size + cost > self.recent_tokens // 2:
+                break
+            keep += 1
+            size += cost
+        cut = len(self.lines) - keep
+        return cut if cut > self.summarized else None
+
+    def _summarize(self, summary, turns, cut):
+        start = time.perf_counter()
+        try:
+            words = int(self.summary_tokens * 0.75)
+            updated = self.llm.generate(SUMMARY_PROMPT.format(
+                summary=summary or "(nothing yet)", turns="\n".join(turns), words=words))
+            updated = updated.strip()[:self.summary_tokens * 4]
+        except Exception as e:
+            log.warning("⚠️ Conversation summary update failed: %s", e)
+            return
+        with self._lock:
+            self.summary = updated
+            self.summarized = cut
+            self.summary_updates += 1
+            self.summary_seconds += time.perf_counter() - start
+
+    def prompt(self, extra="", suffix="AI:", pending=()):
+        """Prefix + summary + recent turns (+ `extra` per-turn guidance) + `suffix`.
+
+        `pending` lines are appended as if they had been added, without
+        storing them (used for speculative prompts).
+        """
+        with self._lock:
+            summary = self.summary
+            recent = self.lines[self.summarized:] + list(pending)
+
+        # Hard cap while a summary update is still catching up
+        budget = 2 * self.recent_tokens
+        size = 0
+        start = len(recent)
+        while start > 0 and (size + estimate_tokens(recent[start - 1]) <= budget
+                             or len(recent) - start < self.min_recent_lines):
+            start -= 1
+            size += estimate_tokens(recent[start])
+        recent = recent[start:]
+
+        parts = [self.prefix, ""]
+        if summary:
+            parts += ["# Earlier in this conversation", summary, ""]
+        parts += recent
+        if extra:
+            parts += [extra]
+        parts += [suffix]
+        prompt = "\n".join(parts)
+
+        tokens = estimate_tokens(prompt)
+        if pending:
+            return prompt  # Speculative; only count prompts that are actually sent
+        PROMPT_TOKENS.observe(tokens)
+        with self._lock:
+            self.prompts += 1
+            self.last_prompt_tokens = tokens
+            self.max_prompt_tokens = max(self.max_prompt_tokens, tokens)
+        return prompt
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lines": len(self.lines),
+                "summarized_lines": self.summarized,
+                "summary_tokens": estimate_tokens(self.summary) if self.summary else 0,
+                "summary_updates": self.summary_updates,
+                "summary_seconds": round(self.summary_seconds, 3),
+                "prefix_tokens": self._prefix_tokens,
+                "last_prompt_tokens": self.last_prompt_tokens,
+                "max_prompt_tokens": self.max_prompt_tokens,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,320 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class ModelBusyError(RuntimeError):
+    """Raised when a shared model already has too many callers waiting."""
+
+
+class BoundedWorker:
+    """Bounded concurrency plus a bounded wait queue in front of a shared model.
+
+    At most `workers` callers use the model at once; up to `max_queue` more
+    may wait (for at most `timeout` seconds). Anyone beyond that is turned
+    away with ModelBusyError instead of piling up.
+    """
+
+    def __init__(self, name, workers=1, max_queue=8, timeout=60.0):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+        self.served = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise ModelBusyError(f"{self.name} is busy ({self.waiting} requests queued)")
+            self.waiting += 1
+
+        try:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise ModelBusyError(f"Timed out waiting {self.timeout}s for {self.name}")
+
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.served += 1
+            self._slots.release()
+
+    @contextmanager
+    def try_slot(self):
+        """Like slot(), but yields False at once unless a worker is free and nobody is waiting."""
+        with self._lock:
+            acquired = self.waiting == 0 and self._slots.acquire(blocking=False)
+            if acquired:
+                self.active += 1
+        if not acquired:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.served += 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_queue": self.max_queue,
+                "served": self.served,
+                "rejected": self.rejected,
+            }
+
+
+class PooledWhisper:
+    """Whisper model shared between sessions; transcribe() runs through the worker pool."""
+
+    def __init__(self, model, worker):
+        self.model = model
+        self.worker = worker
+
+    def transcribe(self, audio, **kwargs):
+        with self.worker.slot():
+            return self.model.transcribe(audio, **kwargs)
+
+    def try_transcribe(self, audio, **kwargs):
+        """transcribe() if a worker is idle right now, else None without queueing."""
+        with self.worker.try_slot() as acquired:
+            return self.model.transcribe(audio, **kwargs) if acquired else None
+
+
+class PooledVoice:
+    """Piper voice shared between sessions.
+
+    A worker slot is held per synthesized chunk (one sentence), not for the
+    whole utterance, so a long reply can't starve other sessions.
+    """
+
+    def __init__(self, voice, worker):
+        self.voice = voice
+        self.worker = worker
+
+    @property
+    def config(self):
+        return self.voice.config
+
+    def synthesize(self, text, *args, **kwargs):
+        chunks = iter(self.voice.synthesize(text, *args, **kwargs))
+        while True:
+            with self.worker.slot():
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class ModelPool:
+    """Process-wide registry for the heavy models so N sessions share one copy.
+
+    Nothing heavy is imported until a model is first requested. Each model
+    goes cold -> loading -> (warming ->) ready, and `preload()` can walk
+    them there in the background while the server is already accepting
+    requests.
+    """
+
+    def __init__(self, whisper_workers=1, tts_workers=2, max_queue=16, timeout=60.0,
+                 whisper_precision="fp32", whisper_threads=None, whisper_greedy=False):
+        self.whisper_workers = whisper_workers
+        # CPU inference options, see modules/whisper_backend.py
+        self.whisper_precision = whisper_precision
+        self.whisper_threads = whisper_threads
+        self.whisper_greedy = whisper_greedy
+        self.tts_workers = tts_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._models = {}
+        self._load_locks = {}
+        self._state = {}
+        self._errors = {}
+        self._expected = set()  # Preload targets readiness waits for
+        self._llm = None
+
+    def _load(self, key, loader):
+        # The registry lock only guards the dicts; the slow load runs under a
+        # per-model lock so /status stays responsive and nothing loads twice
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    return self._models[key]
+                self._state[key] = "loading"
+
+            try:
+                model = loader()
+            except Exception as e:
+                with self._lock:
+                    self._state[key] = "error"
+                    self._errors[key] = str(e)
+                raise
+
+            with self._lock:
+                self._models[key] = model
+                self._state[key] = "ready"
+                self._errors.pop(key, None)
+            return model
+
+    def whisper(self, name="small"):
+        def load():
+            from modules.whisper_backend import WhisperRunner, load_whisper
+
+            log.info("🧠 Loading shared Whisper '%s' model (%s)...", name, self.whisper_precision)
+            worker = BoundedWorker(f"whisper:{name}", self.whisper_workers, self.max_queue, self.timeout)
+            model = load_whisper(name, self.whisper_precision, self.whisper_threads)
+            return PooledWhisper(WhisperRunner(model, greedy=self.whisper_greedy), worker)
+
+        return self._load(f"whisper:{name}", load)
+
+    def voice(self, model_path):
+        def load():
+            from piper import PiperVoice
+
+            log.info("🔊 Loading shared voice model from %s...", model_path)
+            worker = BoundedWorker(f"piper:{os.path.basename(model_path)}",
+                                   self.tts_workers, self.max_queue, self.timeout)
+            return PooledVoice(PiperVoice.load(model_path), worker)
+
+        return self._load(f"piper:{model_path}", load)
+
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                from modules.llm import create_bot
+
+                self._llm = create_bot()
+            return self._llm
+
+    def _warm(self, key, run):
+        with self._lock:
+            self._state[key] = "warming"
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            # A failed warm-up isn't fatal: the model is loaded, just cold
+            log.warning("⚠️ Warm-up failed for %s: %s", key, e)
+        log.info("🔥 Warmed %s in %.2fs", key, time.perf_counter() - start)
+        with self._lock:
+            self._state[key] = "ready"
+
+    def preload(self, whisper_model="small", voice_path=None, llm=True, warmup=True):
+        """Load (and optionally warm) the models a session needs.
+
+        Warm-up is one dummy transcription and one dummy synthesis so the
+        first real turn doesn't pay for lazy kernel/graph initialisation.
+        """
+        import numpy as np
+
+        targets = []
+        if whisper_model:
+            targets.append((f"whisper:{whisper_model}", lambda: self.whisper(whisper_model),
+                            lambda m: m.transcribe(np.zeros(16000, dtype=np.float32), fp16=False)))
+        if voice_path:
+            targets.append((f"piper:{voice_path}", lambda: self.voice(voice_path),
+                            lambda m: list(m.synthesize("Hello."))))
+
+        for key, get, warm in targets:
+            try:
+                model = get()
+            except Exception as e:
+                log.error("❌ Failed to preload %s: %s", key, e)
+                continue
+            if warmup:
+                self._warm(key, lambda: warm(model))
+
+        if llm:
+            try:
+                self.llm()
+            except Exception as e:
+                log.error("❌ Failed to create LLM client: %s", e)
+
+    def preload_in_background(self, whisper_model="small", voice_path=None, llm=True, warmup=True):
+        # Mark the models as expected so readiness reports "not ready" until done
+        keys = []
+        if whisper_model:
+            keys.append(f"whisper:{whisper_model}")
+        if voice_path:
+            keys.append(f"piper:{voice_path}")
+        with self._lock:
+            for key in keys:
+                self._state.setdefault(key, "cold")
+                self._expected.add(key)
+        thread = threading.Thread(target=self.preload, args=(whisper_model, voice_path, llm, warmup),
+                                  name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def readiness(self):
+        """Ready once every background preload target is; with lazy loading
+        (nothing preloaded) the server is always ready."""
+        with self._lock:
+            state = dict(self._state)
+            errors = dict(self._errors)
+            expected = set(self._expected)
+        return {
+            "ready": all(state.get(key) == "ready" for key in expected),
+            "models": state,
+            "errors": errors,
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = {k: m.worker.stats() for k, m in self._models.items()}
+            llm = self._llm
+        if hasattr(llm, "stats"):
+            stats["llm"] = llm.stats()
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide ModelPool, configured from the environment."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool(
+                whisper_workers=int(os.getenv("WHISPER_WORKERS", "1")),
+                tts_workers=int(os.getenv("TTS_WORKERS", "2")),
+                max_queue=int(os.getenv("MODEL_QUEUE_LIMIT", "16")),
+                timeout=float(os.getenv("MODEL_QUEUE_TIMEOUT", "60")),
+                whisper_precision=os.getenv("WHISPER_PRECISION", "fp32"),
+                whisper_threads=int(os.getenv("WHISPER_THREADS", "0")) or None,
+                whisper_greedy=os.getenv("WHISPER_GREEDY", "0") != "0",
+            )
+        return _pool
@@ -1,5 +1,16 @@
-from modules.llm import MistralBot
+from modules.llm_client import LLMError
+from modules.model_pool import get_pool
+from modules.telemetry import bind_context, span
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 import json
+import logging
+import math
+import re
+import threading
+import time
+
+log = logging.getLogger(__name__)
 
 # config/persona_schema.json
 persona_schema = {
@@ -22,12 +33,139 @@ persona_schema = {
     "required": ["values", "goals", "hobbies"]
 }
 
+_validator = None
+
+
+def get_validator():
+    """Compile the persona schema once and reuse the validator."""
+    global _validator
+    if _validator is None:
+        from jsonschema import Draft7Validator
+
+        Draft7Validator.check_schema(persona_schema)
+        _validator = Draft7Validator(persona_schema)
+    return _validator
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting English chat
+    return len(text) // 4 + 1
+
+
+def split_transcript(transcript, max_tokens=3000, overlap_lines=2):
+    """Split a transcript into line-aligned windows of at most ~max_tokens.
+
+    Consecutive windows share `overlap_lines` lines so an answer isn't cut
+    off from the question that prompted it.
+    """
+    lines = [line for line in transcript.splitlines() if line.strip()]
+    windows, current, size = [], [], 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if current and size + cost > max_tokens:
+            windows.append("\n".join(current))
+            current = current[-overlap_lines:] if overlap_lines else []
+            size = sum(estimate_tokens(l) for l in current)
+        current.append(line)
+        size += cost
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+
+def parse_persona(raw):
+    """Pull the first JSON object out of an LLM reply; None if there isn't one."""
+    try:
+        data = json.loads(raw)
+        return data if isinstance(data, dict) else None
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    # Strip ```json fences, then try every '{' until one decodes
+    text = re.sub(r"```(?:json)?", "", raw or "")
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", text):
+        try:
+            data, _ = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _normalize(value):
+    return re.sub(r"[\s.!,;]+$", "", str(value).strip()).casefold()
+
+
+def merge_personas(partials):
+    """Deterministically merge partial personas extracted from different windows.
+
+    Lists are unioned in first-seen order with case/punctuation-insensitive
+    dedupe. For single values the most frequent answer wins; ties go to the
+    later window, since people correct and refine themselves as they talk.
+    Partials should already have been through validate_persona; list fields
+    that are neither a list nor a string are skipped.
+    """
+    merged = {}
+    for field, spec in persona_schema["properties"].items():
+        if spec["type"] == "array":
+            seen, items = set(), []
+            for partial in partials:
+                values = partial.get(field) or []
+                if isinstance(values, str):
+                    values = [values]
+                elif not isinstance(values, list):
+                    continue
+                for item in values:
+                    key = _normalize(item)
+                    if key and key not in seen:
+                        seen.add(key)
+                        items.append(str(item).strip())
+            merged[field] = items
+        else:
+            candidates = [(i, p[field]) for i, p in enumerate(partials)
+                          if p.get(field) not in (None, "", [])]
+            if not candidates:
+                continue
+            counts = Counter(_normalize(v) for _, v in candidates)
+            best = max(candidates, key=lambda c: (counts[_normalize(c[1])], c[0]))
+            merged[field] = best[1]
+    return merged
+
+
+def validate_persona(persona):
+    """Coerce what we can and drop fields that don't match the schema."""
+    persona = dict(persona)
+    age = persona.get("age")
+    if isinstance(age, str) and age.strip().isdigit():
+        persona["age"] = int(age.strip())
+
+    for error in get_validator().iter_errors(persona):
+        if error.path:
+            persona.pop(error.path[0], None)
+
+    for field in persona_schema["required"]:
+        persona.setdefault(field, [])
+    return persona
+
+
 class PersonaBuilder:
-    def __init__(self):
-        self.llm = MistralBot()
+    """Extracts a persona from a transcript.
+
+    Short transcripts go to the LLM in one prompt. Long ones are split into
+    token-budgeted windows that are extracted concurrently (map) and merged
+    against `persona_schema` (reduce), so a 60-minute session costs a few
+    parallel mid-sized calls instead of one huge one.
+    """
 
-    def build(self, transcript):
-        prompt = f"""
+    def __init__(self, llm=None, chunk_tokens=3000, max_workers=4):
+        self.llm = llm or get_pool().llm()
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+
+    def _prompt(self, transcript):
+        return f"""
         Based on the following conversation, extract a deep user persona in JSON format.
         Use this schema:
         {json.dumps(persona_schema, indent=2)}
@@ -43,16 +181,176 @@ class PersonaBuilder:
         Output only valid JSON:
         """
 
-        raw = self.llm.generate(prompt)
-        #print("raw",raw)
+    def extract(self, transcript):
+        """One LLM call over one window; returns (persona or None, raw reply)."""
+        try:
+            raw = self.llm.generate(self._prompt(transcript))
+        except LLMError as e:
+            log.error("❌ Persona extraction failed: %s", e)
+            return None, ""
+        return parse_persona(raw), raw
+
+    def build(self, transcript, chunked=None):
+        """Build a persona. `chunked=None` picks map-reduce only when needed."""
+        windows = split_transcript(transcript, self.chunk_tokens)
+        with span("persona.build", windows=len(windows)):
+            if chunked is False or (chunked is None and len(windows) <= 1):
+                persona, raw = self.extract(transcript)
+                if persona is None:
+                    return {"error": "Could not parse persona", "raw": raw}
+                return validate_persona(persona)
+
+            log.info("🧩 Building persona from %d transcript windows...", len(windows))
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(windows))) as pool:
+                results = list(pool.map(self.extract, windows))
+
+            # Validate each window on its own so one bad value only loses that field
+            partials = [validate_persona(persona) for persona, _ in results if persona is not None]
+            if not partials:
+                return {"error": "Could not parse persona", "raw": results[-1][1] if results else ""}
+            if len(partials) < len(windows):
+                log.warning("⚠️ %d of %d windows could not be parsed", len(windows) - len(partials), len(windows))
+
+            return validate_persona(merge_personas(partials))
+
+
+class IncrementalPersonaExtractor:
+    """Keeps a persona draft up to date while the conversation is running.
+
+    Every `every_n_turns` completed turns, only the lines added since the
+    last update are extracted on a background thread and merged into the
+    draft. At the end `finalize()` handles the few remaining lines and does a
+    merge/validate pass, instead of one long build over the whole transcript.
+    """
+
+    def __init__(self, builder, transcript, every_n_turns=6, context_lines=2):
+        self.builder = builder
+        self.transcript = transcript  # The session's live list of lines
+        self.every_n_turns = every_n_turns
+        self.context_lines = context_lines
+        self.processed = 0
+        self.turns_since_update = 0
+        self.partials = []
+        self.draft = {}
+        self.version = 0
+        self.background_seconds = 0.0
+        self.finalize_seconds = None
+        self.full_build_seconds = None  # Estimated cost of PersonaBuilder.build at the end
+        self.extract_calls = 0
+        self.extract_seconds = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persona-draft")
+        self._pending = None
+        self._closed = False
+
+    def turn_completed(self):
+        """Call after each user/AI exchange; schedules an update when due."""
+        self.turns_since_update += 1
+        if self.turns_since_update < self.every_n_turns:
+            return False
+        if self._pending is not None and not self._pending.done():
+            return False  # Previous update still running; catch up next turn
+        if self._closed:
+            return False
+        self._pending = self._executor.submit(bind_context(self._update), *self._take_new_lines())
+        self.turns_since_update = 0
+        return True
+
+    def _take_new_lines(self):
+        end = len(self.transcript)
+        context = self.transcript[max(0, self.processed - self.context_lines):self.processed]
+        new = self.transcript[self.processed:end]
+        self.processed = end
+        return context, new
+
+    def _extract(self, context, new):
+        text = "\n".join(new)
+        if context:
+            text = "(Earlier context)\n" + "\n".join(context) + "\n(New turns)\n" + text
+        start = time.perf_counter()
+        persona, _ = self.builder.extract(text)
+        with self._lock:
+            self.extract_calls += 1
+            self.extract_seconds += time.perf_counter() - start
+        return None if persona is None else validate_persona(persona)
+
+    def _update(self, context, new):
+        # Never raises: finalize() waits on this, and a failed update only
+        # means the previous draft stays
+        start = time.perf_counter()
         try:
-            persona = json.loads(raw)
-            #print("persona",persona)
-            return persona
-        except:
-            # Fallback cleaning
-            import re
-            json_str = re.search(r"\{.*\}", raw, re.DOTALL)
-            if json_str:
-                return json.loads(json_str.group())
-            return {"error": "Could not parse persona", "raw": raw}
+            persona = self._extract(context, new)
+            if persona is not None:
+                draft = validate_persona(merge_personas(self.partials + [persona]))
+                with self._lock:
+                    self.partials.append(persona)
+                    self.draft = draft
+                    self.version += 1
+        except Exception as e:
+            log.warning("⚠️ Persona draft update failed: %s", e)
+        with self._lock:
+            self.background_seconds += time.perf_counter() - start
+
+    def snapshot(self):
+        with self._lock:
+            return self.version, dict(self.draft)
+
+    def finalize(self):
+        """Extract whatever is left and reconcile the partial personas."""
+        start = time.perf_counter()
+        if self._pending is not None:
+            self._pending.result()
+
+        context, new = self._take_new_lines()
+        if new:
+            persona = self._extract(context, new)
+            if persona is not None:
+                self.partials.append(persona)
+
+        full = "\n".join(self.transcript)
+        full_build = False
+        if self.partials:
+            persona = validate_persona(merge_personas(self.partials))
+        else:
+            # Nothing usable in the background; fall back to a full build
+            persona = self.builder.build(full)
+            full_build = True
+
+        self.close()
+        self.finalize_seconds = time.perf_counter() - start
+        self.full_build_seconds = self.finalize_seconds if full_build else self._estimate_full_build(full)
+        return persona
+
+    def _estimate_full_build(self, transcript):
+        # What PersonaBuilder.build would have cost here: its windows run
+        # max_workers at a time, each about as long as an extraction call took
+        with self._lock:
+            if not self.extract_calls:
+                return None
+            per_call = self.extract_seconds / self.extract_calls
+        windows = len(split_transcript(transcript, self.builder.chunk_tokens)) or 1
+        return math.ceil(windows / self.builder.max_workers) * per_call
+
+    def close(self):
+        """Stop the background thread; an update already running is left to finish."""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """How much extraction moved off the end of the session.
+
+        `background_seconds` is extraction work done during the conversation
+        and `finalize_seconds` what was left for the end. `saved_seconds` is
+        the end-of-session latency saved: the estimated full build over the
+        final transcript (`full_build_seconds`, from the mean extraction call
+        time and the builder's windowing) minus `finalize_seconds`.
+        """
+        with self._lock:
+            finalize, full = self.finalize_seconds, self.full_build_seconds
+            return {
+                "updates": self.version,
+                "background_seconds": round(self.background_seconds, 3),
+                "finalize_seconds": None if finalize is None else round(finalize, 3),
+                "full_build_seconds": None if full is None else round(full, 3),
+                "saved_seconds": None if finalize is None or full is None else round(full - finalize, 3),
+            }
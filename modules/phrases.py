@@ -0,0 +1,18 @@
+# Fixed lines spoken in every session. Kept in one place so they can be
+# pre-rendered into the TTS cache (scripts/prerender_tts.py).
+
+INTRO = "Hey there! I'm Alex — your witty onboarding buddy. Ready for a fun 40-minute chat to build your AI twin? Just say 'start' when you're ready."
+NOT_READY = "No worries! Restart me when you're ready."
+BEGIN = "Awesome! Let's begin."
+TIME_UP = "We've been chatting for a while — let me wrap up and build your AI twin."
+EXIT_ACK = "Got it! Thanks for such a great conversation. Let me generate your deep user persona now."
+WRAP_UP = "That was awesome! Let me build your deep user persona now."
+COMPLETE = "Onboarding complete! Your AI twin now understands you deeply. Welcome aboard!"
+
+ENGINE_INTRO = "Hey there! I'm Alex — your witty onboarding buddy. Ready to dive into a fun, 40-minute chat to build your personal AI twin? No pressure, just vibes. Let's go!"
+ENGINE_WRAP_UP = "That was awesome! Let me generate your deep user persona now."
+
+# Spoken when the LLM (and its fallback) can't produce a reply
+LLM_APOLOGY = "I'm having trouble thinking right now. Let's try again."
+
+ALL = [INTRO, NOT_READY, BEGIN, TIME_UP, EXIT_ACK, WRAP_UP, COMPLETE, ENGINE_INTRO, ENGINE_WRAP_UP, LLM_APOLOGY]
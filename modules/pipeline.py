@@ -0,0 +1,328 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+from modules.audio_buffer import get_audio_input
+from modules.llm import reply_stream
+from modules.segmenter import SentenceSegmenter
+from modules.vad import EnergyVAD
+
+log = logging.getLogger(__name__)
+
+# Blocking work (Whisper, Groq, waiting on the pool) runs here so the event
+# loop only ever shuffles queues
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PIPELINE_THREADS", "32")),
+                               thread_name_prefix="pipeline")
+
+_FAILED = object()
+
+
+def run_blocking(func, *args):
+    # Carry the caller's context (e.g. the session trace) into the worker thread
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_executor, ctx.run, func, *args)
+
+
+class MicrophoneStream:
+    """Frames from the shared input ring buffer (modules/audio_buffer.py), for asyncio.
+
+    Frames are zero-copy views into the ring. If the consumer falls more
+    than a ring behind, the lapped audio is skipped (see `dropped`).
+    """
+
+    def __init__(self, audio=None, frame_size=480):
+        self.audio = audio or get_audio_input()
+        self.sample_rate = self.audio.sample_rate
+        self.frame_size = frame_size
+        self.cursor = None
+
+    @property
+    def dropped(self):
+        return self.cursor.dropped if self.cursor else 0
+
+    async def __aenter__(self):
+        self.cursor = self.audio.cursor()
+        self._poll = self.frame_size / self.sample_rate / 4
+        return self
+
+    async def __aexit__(self, *exc):
+        pass  # The input stream itself stays up for the next session
+
+    async def read(self):
+        while True:
+            frame = self.cursor.read(self.frame_size)
+            if frame is not None:
+                return frame
+            await asyncio.sleep(self._poll)
+
+
+class VoicePipeline:
+    """Asyncio voice loop: capture -> transcribe -> generate -> speak.
+
+    Capture and transcription run as background tasks connected by queues
+    and keep going while the AI talks, so if the user starts speaking during
+    playback (barge-in) the current speech and LLM generation are cancelled
+    and the new utterance becomes the next turn.
+    """
+
+    def __init__(self, stt, tts, llm, vad_config=None, barge_in=True, barge_in_threshold=0.05,
+                 max_utterance=15.0, sample_rate=16000, source=None, speculator=None,
+                 speculate_after_ms=250):
+        self.stt = stt
+        self.tts = tts
+        self.llm = llm
+        self.vad_config = vad_config or {}
+        self.barge_in = barge_in
+        # The mic also hears our own voice; require louder speech to interrupt
+        self.barge_in_threshold = barge_in_threshold
+        self.max_utterance = max_utterance
+        self.sample_rate = sample_rate
+        self.source = source
+        # Optional Speculator: on a pause of speculate_after_ms, transcribe
+        # what we have and start the LLM before the utterance is over
+        self.speculator = speculator
+        self.speculate_after_ms = speculate_after_ms
+
+        self.events = asyncio.Queue()
+        self.utterances = asyncio.Queue(maxsize=4)
+        self.transcripts = asyncio.Queue(maxsize=4)
+        self.speaking = False
+        self.interruptions = 0
+        self.error = None
+        self.last_response = ""
+        self.last_interrupted = False
+        self._current = None  # (SpeechHandle, generation cancel Event)
+        self._tasks = []
+        self._speculations = set()
+        # Utterances are numbered so speculation can't outlive its own turn
+        self._captured = 0  # Utterances handed to transcription so far
+        self._transcript_seq = None  # Utterance behind the last next_transcript()
+
+    @asynccontextmanager
+    async def running(self):
+        """Start capture and transcription stages for the duration of a session."""
+        vad = EnergyVAD(sample_rate=self.sample_rate, **self.vad_config)
+        source = self.source or MicrophoneStream(getattr(self.stt, "audio", None), vad.frame_size)
+        async with source as mic:
+            self._tasks = [
+                asyncio.create_task(self._guard(self._capture_stage(mic, vad))),
+                asyncio.create_task(self._guard(self._transcribe_stage())),
+            ]
+            try:
+                yield self
+            finally:
+                self.interrupt(emit=False)
+                if self.speculator is not None:
+                    self.speculator.cancel()
+                tasks = self._tasks + list(self._speculations)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _guard(self, stage):
+        try:
+            await stage
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Surface stage failures to whoever is waiting for the next turn
+            log.error("❌ Pipeline stage failed: %s", e)
+            self.error = e
+            await self.transcripts.put(_FAILED)
+
+    async def _capture_stage(self, mic, vad):
+        base_threshold = vad.threshold
+        max_frames = int(self.max_utterance * self.sample_rate / vad.frame_size)
+        speculate_frames = max(1, int(self.speculate_after_ms * self.sample_rate / 1000 / vad.frame_size))
+        pre_roll = deque(maxlen=max(1, vad.pre_roll_frames))
+        speech = []
+        announced = False
+        speculated = False
+
+        while True:
+            frame = await mic.read()
+            vad.threshold = max(base_threshold, self.barge_in_threshold) if self.speaking else base_threshold
+            ended = vad.process(frame)
+
+            if not speech:
+                if vad.speech_start is None:
+                    pre_roll.append(frame)
+                    continue
+                speech = list(pre_roll) + [frame]
+            else:
+                speech.append(frame)
+                if vad.speech_start is None:
+                    # Only a click or breath; go back to waiting
+                    speech = []
+                    pre_roll.clear()
+                    continue
+
+            if vad.triggered and not announced:
+                announced = True
+                if self.speaking and self.barge_in:
+                    self.interrupt()
+
+            if self.speculator is not None and vad.triggered and not ended:
+                if vad.silence_frames == 0:
+                    speculated = False  # Still talking; the next pause may speculate again
+                elif vad.silence_frames >= speculate_frames and not speculated:
+                    speculated = True
+                    trailing = vad.silence_frames
+                    self._speculate(np.concatenate(speech[:len(speech) - trailing]), self._captured)
+
+            if ended or len(speech) >= max_frames:
+                trailing = max(0, vad.silence_frames - vad.pre_roll_frames)
+                audio = np.concatenate(speech[:len(speech) - trailing] if trailing else speech)
+                if vad.triggered:
+                    seq = self._captured
+                    self._captured += 1
+                    await self.utterances.put((seq, audio))
+
+                noise_floor = vad.noise_floor
+                vad.reset()
+                vad.noise_floor = noise_floor
+                speech = []
+                pre_roll.clear()
+                announced = False
+                speculated = False
+
+    def _speculate(self, audio, seq):
+        # Speculative transcription only runs on an idle Whisper: queued
+        # behind other work it would delay the final transcription instead
+        transcribe = getattr(self.stt, "try_transcribe", self.stt.transcribe)
+
+        async def run():
+            if seq < self._captured:
+                return  # The utterance already ended
+            text = await run_blocking(transcribe, audio)
+            if text and text.strip():
+                await run_blocking(self.speculator.start, text, seq)
+
+        task = asyncio.create_task(run())
+        self._speculations.add(task)
+        task.add_done_callback(self._speculations.discard)
+
+    async def _transcribe_stage(self):
+        while True:
+            seq, audio = await self.utterances.get()
+            text = await run_blocking(self.stt.transcribe, audio)
+            if text.strip():
+                await self.transcripts.put((seq, text))
+
+    async def next_transcript(self, timeout=None):
+        """Wait for the user's next utterance; returns "" on timeout."""
+        try:
+            item = await asyncio.wait_for(self.transcripts.get(), timeout)
+        except asyncio.TimeoutError:
+            return ""
+        if item is _FAILED:
+            raise self.error
+        self._transcript_seq, text = item
+        return text
+
+    def interrupt(self, emit=True):
+        """Barge-in: stop playback and abandon the in-flight generation."""
+        if self._current is None:
+            return
+        handle, cancel = self._current
+        if not handle.done:
+            handle.cancel()
+            cancel.set()
+            self.interruptions += 1
+            if emit:
+                log.info("✋ Barge-in: user started talking, stopping playback")
+                self.events.put_nowait("INTERRUPTED")
+
+    async def _wait_speech(self, handle, cancel):
+        self._current = (handle, cancel)
+        self.speaking = True
+        try:
+            while not handle.done:
+                await asyncio.sleep(0.02)
+        finally:
+            self.speaking = False
+            self._current = None
+        return not handle.cancelled
+
+    async def say(self, text, cache=False):
+        """Speak a fixed line; returns False if the user talked over it."""
+        handle = self.tts.speak_async(text, cache=cache)
+        return await self._wait_speech(handle, threading.Event())
+
+    async def respond(self, prompt, user_text=None):
+        """Stream an LLM reply into TTS, yielding AI_PARTIAL events.
+
+        The final text is left in `last_response`, and `last_interrupted`
+        says whether the user barged in. With a speculator, a candidate
+        started on a partial transcript matching `user_text` is used
+        instead of a new LLM call.
+        """
+        loop = asyncio.get_running_loop()
+        while not self.events.empty():
+            self.events.get_nowait()  # Stale barge-ins from fixed lines
+        tokens = asyncio.Queue()
+        cancel = threading.Event()
+
+        candidate = None
+        if self.speculator is not None and user_text is not None:
+            candidate = self.speculator.take(user_text, self._transcript_seq)
+
+        def produce():
+            stream = candidate.stream() if candidate else reply_stream(self.llm, prompt)
+            try:
+                for token in stream:
+                    if cancel.is_set():
+                        break
+                    loop.call_soon_threadsafe(tokens.put_nowait, token)
+            finally:
+                stream.close()
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        producer = run_blocking(produce)
+        handle = self.tts.speak_async()
+        playback = asyncio.create_task(self._wait_speech(handle, cancel))
+        await asyncio.sleep(0)  # Let playback register itself for barge-in
+
+        segmenter = SentenceSegmenter()
+        spoken = []
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                if cancel.is_set():
+                    continue
+                for sentence in segmenter.feed(token):
+                    handle.feed(sentence)
+                    spoken.append(sentence)
+                    yield f"AI_PARTIAL: {' '.join(spoken)}"
+                while not self.events.empty():
+                    yield self.events.get_nowait()
+
+            rest = segmenter.flush()
+            if rest and not cancel.is_set():
+                handle.feed(rest)
+                spoken.append(rest)
+            handle.finish()
+
+            completed = await playback
+            await producer
+        finally:
+            if not handle.done:
+                handle.cancel()
+                cancel.set()
+            if candidate is not None and cancel.is_set():
+                candidate.cancel()
+
+        while not self.events.empty():
+            yield self.events.get_nowait()
+
+        self.last_response = " ".join(spoken)
+        self.last_interrupted = not completed
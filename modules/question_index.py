@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_INDEX_DIR = "models/question_index"
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(model_name=DEFAULT_MODEL):
+    """Load a sentence-transformers model once per process."""
+    with _encoders_lock:
+        if model_name not in _encoders:
+            from sentence_transformers import SentenceTransformer
+
+            log.info("🧠 Loading sentence encoder %s...", model_name)
+            _encoders[model_name] = SentenceTransformer(model_name, device="cpu")
+        return _encoders[model_name]
+
+
+def question_text(question):
+    """Text embedded for a question: its trigger topic plus the question itself."""
+    trigger = question.get("trigger", "")
+    if trigger.startswith("mentions "):
+        trigger = trigger[len("mentions "):]
+    return f"{trigger}. {question['question']}" if trigger else question["question"]
+
+
+def bank_fingerprint(questions):
+    payload = json.dumps(questions, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuestionIndex:
+    """Nearest-neighbour index over personalized questions.
+
+    Embeddings are L2-normalised, so inner product is cosine similarity.
+    On disk the matrix is a .npy file, plus a FAISS index when FAISS is
+    installed. `load()` memory-maps both and never copies them into memory:
+    searches go through the mapped FAISS index if this FAISS build can map
+    flat indexes (IO_FLAG_MMAP_IFC), and through NumPy over the mapped .npy
+    otherwise. A freshly built index is searched in memory.
+    """
+
+    def __init__(self, embeddings, questions, model_name=DEFAULT_MODEL, fingerprint=None, encoder=None,
+                 faiss_index=None):
+        self.embeddings = embeddings
+        self.questions = questions
+        self.model_name = model_name
+        self.fingerprint = fingerprint
+        self._encoder = encoder
+        self._faiss = faiss_index
+
+    @staticmethod
+    def _build_faiss(embeddings):
+        try:
+            import faiss
+        except ImportError:
+            return None
+        index = faiss.IndexFlatIP(embeddings.shape[1])
+        if len(embeddings):
+            index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+        return index
+
+    @staticmethod
+    def _read_faiss(path, size):
+        try:
+            import faiss
+        except ImportError:
+            return None
+        # Older builds read flat codes into memory even with IO_FLAG_MMAP;
+        # there the .npy memmap is searched instead
+        flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if flag is None or not os.path.exists(path):
+            return None
+        try:
+            index = faiss.read_index(path, flag)
+        except RuntimeError as e:
+            log.warning("⚠️ Could not memory-map %s, searching with NumPy: %s", path, e)
+            return None
+        return index if index.ntotal == size else None
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = get_encoder(self.model_name)
+        return self._encoder
+
+    def encode(self, texts):
+        vectors = self.encoder.encode(texts, batch_size=64, normalize_embeddings=True,
+                                      convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    @classmethod
+    def build(cls, bank, model_name=DEFAULT_MODEL, encoder=None):
+        questions = [q for q in bank if q.get("type") == "personalized"]
+        index = cls(np.zeros((0, 1), dtype=np.float32), questions, model_name,
+                    bank_fingerprint(bank), encoder)
+        if questions:
+            index.embeddings = index.encode([question_text(q) for q in questions])
+            index._faiss = cls._build_faiss(index.embeddings)
+        return index
+
+    def save(self, directory=DEFAULT_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "embeddings.npy"), np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        faiss_path = os.path.join(directory, "index.faiss")
+        faiss_index = self._faiss if self._faiss is not None else self._build_faiss(self.embeddings)
+        if faiss_index is not None:
+            import faiss
+
+            faiss.write_index(faiss_index, faiss_path)
+        elif os.path.exists(faiss_path):
+            os.remove(faiss_path)  # Stale: would no longer match embeddings.npy
+        with open(os.path.join(directory, "questions.json"), "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "fingerprint": self.fingerprint,
+                       "questions": self.questions}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory=DEFAULT_INDEX_DIR):
+        with open(os.path.join(directory, "questions.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        faiss_index = cls._read_faiss(os.path.join(directory, "index.faiss"), len(embeddings))
+        return cls(embeddings, meta["questions"], meta["model"], meta.get("fingerprint"), faiss_index=faiss_index)
+
+    def search(self, vector, k=5):
+        """Return [(score, position)] of the k most similar questions."""
+        if not len(self.questions):
+            return []
+        k = min(k, len(self.questions))
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        if self._faiss is not None:
+            scores, ids = self._faiss.search(vector, k)
+            return [(float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+
+        scores = self.embeddings @ vector[0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(i)) for i in top]
+
+    def match(self, text, threshold=0.45, exclude=(), k=5):
+        """Best unasked question for `text` above `threshold`, as (position, question)."""
+        if not text.strip() or not len(self.questions):
+            return None
+        for score, position in self.search(self.encode([text])[0], k):
+            if score < threshold:
+                break
+            if position not in exclude:
+                return position, self.questions[position]
+        return None
+
+
+def load_or_build(bank_path="prompts/question_bank.json", directory=DEFAULT_INDEX_DIR, model_name=DEFAULT_MODEL):
+    """Load the persisted index, rebuilding it if the question bank changed."""
+    with open(bank_path, "r", encoding="utf-8") as f:
+        bank = json.load(f)
+
+    fingerprint = bank_fingerprint(bank)
+    try:
+        index = QuestionIndex.load(directory)
+        if index.fingerprint == fingerprint and index.model_name == model_name:
+            return index
+        log.info("♻️ Question bank changed, rebuilding index...")
+    except (OSError, ValueError, KeyError):
+        log.info("🧱 Building question index...")
+
+    index = QuestionIndex.build(bank, model_name)
+    index.save(directory)
+    return QuestionIndex.load(directory)
@@ -0,0 +1,283 @@
+"""Voice sessions for remote clients: microphone audio in and speech out over one WebSocket.
+
+Protocol (see main.py `/ws/audio`):
+
+- client -> server, binary: microphone audio in `encoding` ("pcm16",
+  "f32" or "mulaw"; mono, little-endian) at `sample_rate`;
+- client -> server, text: `{"type": "stop"}` to end the session;
+- server -> client, text: JSON messages `{"type": "event", "data": ...}`
+  (the same events as the SSE stream), `{"type": "audio_start",
+  "sample_rate": ...}`, `{"type": "audio_end"}`, `{"type": "clear"}`
+  (barge-in: drop anything still buffered) and `{"type": "error", ...}`;
+- server -> client, binary: synthesized speech as PCM16.
+
+Both directions are bounded. Incoming audio goes into a ring buffer the
+session reads like the local microphone; if the session falls behind, the
+receive loop waits for it, which stops reading the socket and pushes back
+on the client through TCP. Outgoing messages go through one bounded queue,
+and TTS writes are paced to real time, so a slow client stalls its own
+session's synthesis instead of growing server memory.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import time
+import weakref
+
+import numpy as np
+
+from modules.audio_buffer import AudioInput, Cursor
+from modules.utils import StreamResampler
+
+log = logging.getLogger(__name__)
+
+ENCODINGS = ("pcm16", "f32", "mulaw")
+
+
+def _mulaw_table():
+    # G.711 mu-law expansion for all 256 codes
+    codes = ~np.arange(256, dtype=np.uint8)
+    exponent = (codes >> 4) & 0x07
+    mantissa = (codes & 0x0F).astype(np.int32)
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return (np.where(codes & 0x80, -magnitude, magnitude) / 32768.0).astype(np.float32)
+
+
+_MULAW = _mulaw_table()
+_MULAW_ORDER = np.argsort(_MULAW, kind="stable")
+
+
+def decode_audio(data, encoding):
+    """Client audio bytes -> float32 samples."""
+    if encoding in ("pcm16", "f32"):
+        width = 2 if encoding == "pcm16" else 4
+        data = data[:len(data) - len(data) % width]  # Ignore a torn trailing sample
+    if encoding == "pcm16":
+        return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if encoding == "f32":
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+    if encoding == "mulaw":
+        return _MULAW[np.frombuffer(data, dtype=np.uint8)]
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def encode_audio(audio, encoding):
+    """float32 samples -> bytes in `encoding` (the inverse of decode_audio)."""
+    if encoding == "pcm16":
+        return (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+    if encoding == "f32":
+        return np.asarray(audio, dtype="<f4").tobytes()
+    if encoding == "mulaw":
+        # Nearest code in the expansion table
+        samples = np.clip(audio, -1, 1)
+        values = _MULAW[_MULAW_ORDER]
+        index = np.searchsorted(values, samples).clip(1, 255)
+        nearer = np.where(samples - values[index - 1] < values[index] - samples, index - 1, index)
+        return _MULAW_ORDER[nearer].astype(np.uint8).tobytes()
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+class RemoteAudioInput(AudioInput):
+    """AudioInput fed by a client connection instead of the local microphone.
+
+    `feed()` waits (up to `backpressure_timeout`) while the slowest reader is
+    more than `max_lag_seconds` behind, rather than overwriting audio that
+    hasn't been read yet.
+    """
+
+    def __init__(self, sample_rate=16000, frame_size=480, capacity_seconds=10, max_lag_seconds=5,
+                 backpressure_timeout=2.0):
+        super().__init__(sample_rate, frame_size, capacity_seconds)
+        self.max_lag = int(max_lag_seconds * sample_rate)
+        self.backpressure_timeout = backpressure_timeout
+        self.stalled_seconds = 0.0
+        self._cursors = weakref.WeakSet()
+
+    def start(self):
+        pass  # Audio arrives through feed()
+
+    def stop(self):
+        pass
+
+    def cursor(self):
+        cursor = Cursor(self.ring, self.sample_rate, self.ring.written)
+        self._cursors.add(cursor)
+        return cursor
+
+    def lag(self):
+        """Samples the slowest reader has yet to read."""
+        positions = [c.position for c in list(self._cursors)]
+        return self.ring.written - min(positions) if positions else 0
+
+    async def feed(self, samples):
+        start = time.monotonic()
+        while self.lag() + len(samples) > self.max_lag:
+            if time.monotonic() - start >= self.backpressure_timeout:
+                break  # A reader that stopped reading; let it be lapped
+            await asyncio.sleep(self.frame_size / self.sample_rate)
+        self.stalled_seconds += time.monotonic() - start
+        self.ring.write(samples)
+
+    def stats(self):
+        stats = super().stats()
+        stats["stalled_seconds"] = round(self.stalled_seconds, 2)
+        return stats
+
+
+class _RemoteSink:
+    """TTS sink (see modules/tts.py) that sends speech to the client.
+
+    Writes are paced to real time plus `lead_seconds` of client-side
+    buffering, so a SpeechHandle finishes about when the client has played
+    it, as with a local speaker, and barge-in still has something to cut.
+    """
+
+    def __init__(self, connection, lead_seconds):
+        self.connection = connection
+        self.lead_seconds = lead_seconds
+        self.sample_rate = None
+        self.started = None
+        self.sent = 0
+
+    def open(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.connection.put_threadsafe(json.dumps({"type": "audio_start", "sample_rate": sample_rate}))
+
+    def write(self, block):
+        if self.started is None:
+            self.started = time.monotonic()
+        self.connection.put_threadsafe(encode_audio(block, "pcm16"))
+        self.sent += len(block)
+        ahead = self.sent / self.sample_rate - (time.monotonic() - self.started) - self.lead_seconds
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def close(self, abort=False):
+        if abort:
+            self.connection.clear_threadsafe()
+            return
+        if self.started is not None:
+            # Like a local stream's stop(): return once the client has played it
+            remaining = self.sent / self.sample_rate - (time.monotonic() - self.started)
+            if remaining > 0:
+                time.sleep(remaining)
+        self.connection.put_threadsafe(json.dumps({"type": "audio_end"}))
+
+
+class AudioConnection:
+    """One client's voice session over a WebSocket (Starlette/FastAPI).
+
+    `input` is the session's microphone and `sink` its TTS sink factory.
+    Everything sent to the client goes through a queue of at most
+    `max_pending` messages.
+    """
+
+    def __init__(self, websocket, encoding="pcm16", sample_rate=16000, max_pending=64,
+                 lead_seconds=0.5, capacity_seconds=10):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding {encoding!r}")
+        self.websocket = websocket
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.lead_seconds = lead_seconds
+        self.input = RemoteAudioInput(capacity_seconds=capacity_seconds)
+        # One resampler for the whole connection: frames are pieces of one stream
+        self.resampler = StreamResampler(sample_rate, self.input.sample_rate)
+        self.outgoing = asyncio.Queue(maxsize=max_pending)
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def sink(self):
+        return _RemoteSink(self, self.lead_seconds)
+
+    async def receive(self):
+        """Feed client audio into `input` until the client stops or disconnects."""
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                self.bytes_in += len(message["bytes"])
+                samples = decode_audio(message["bytes"], self.encoding)
+                await self.input.feed(self.resampler.process(samples))
+            elif message.get("text") is not None:
+                try:
+                    control = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    continue
+                if control.get("type") == "stop":
+                    return
+
+    async def send_loop(self):
+        while True:
+            item = await self.outgoing.get()
+            if self.closed:
+                continue  # Keep draining so blocked producers get through
+            try:
+                if isinstance(item, bytes):
+                    await self.websocket.send_bytes(item)
+                    self.bytes_out += len(item)
+                else:
+                    await self.websocket.send_text(item)
+            except Exception as e:
+                log.info("🔌 Client connection lost: %s", e)
+                self.closed = True
+
+    async def send(self, message):
+        await self.outgoing.put(json.dumps(message))
+
+    async def forward(self, events):
+        """Send a session's event stream (SessionManager.astream) to the client."""
+        async for event in events:
+            await self.send({"type": "event", "data": event})
+
+    def put_threadsafe(self, item):
+        """Queue an outgoing message from a non-event-loop thread (TTS playback)."""
+        if self.closed:
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.outgoing.put(item), self.loop)
+        except RuntimeError:
+            return  # Loop already closed
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                if self.closed:
+                    future.cancel()
+                    return
+
+    def _clear(self):
+        # Drop queued speech but keep events, then tell the client to flush its buffer
+        kept = []
+        while not self.outgoing.empty():
+            item = self.outgoing.get_nowait()
+            if not isinstance(item, bytes):
+                kept.append(item)
+        for item in kept:
+            self.outgoing.put_nowait(item)
+        if not self.outgoing.full():
+            self.outgoing.put_nowait(json.dumps({"type": "clear"}))
+
+    def clear_threadsafe(self):
+        if not self.closed:
+            self.loop.call_soon_threadsafe(self._clear)
+
+    async def flush(self, timeout=2.0):
+        """Wait (briefly) for queued messages to reach the client."""
+        deadline = time.monotonic() + timeout
+        while not self.outgoing.empty() and not self.closed and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+
+    def stats(self):
+        return {
+            "encoding": self.encoding,
+            "sample_rate": self.sample_rate,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "pending": self.outgoing.qsize(),
+            "input": self.input.stats(),
+        }
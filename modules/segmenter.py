@@ -0,0 +1,56 @@
+import re
+
+# Sentence end: terminal punctuation, optional closing quotes/brackets, then whitespace
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”’)\]]*\s+")
+
+# Common abbreviations that end in a period but don't end a sentence
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "jr.", "sr."}
+
+
+class SentenceSegmenter:
+    """Turns a stream of LLM tokens into complete sentences for TTS.
+
+    Sentences shorter than `min_chars` are held back and merged with the
+    next one so Piper isn't asked to voice a lone "Ha!".
+    """
+
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token):
+        """Add a token and return any sentences it completed."""
+        self.buffer += token
+        sentences = []
+        search_from = 0
+
+        while True:
+            match = _BOUNDARY.search(self.buffer, search_from)
+            if not match:
+                break
+            candidate = self.buffer[:match.end()].strip()
+            last_word = candidate.split()[-1].lower() if candidate else ""
+            if last_word in _ABBREVIATIONS or len(candidate) < self.min_chars:
+                search_from = match.end()
+                continue
+            sentences.append(candidate)
+            self.buffer = self.buffer[match.end():]
+            search_from = 0
+
+        return sentences
+
+    def flush(self):
+        """Return whatever is left once the token stream has ended."""
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return rest
+
+
+def stream_sentences(tokens, min_chars=12):
+    """Yield complete sentences from an iterable of tokens."""
+    segmenter = SentenceSegmenter(min_chars=min_chars)
+    for token in tokens:
+        yield from segmenter.feed(token)
+    rest = segmenter.flush()
+    if rest:
+        yield rest
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from modules.model_pool import ModelBusyError
+
+log = logging.getLogger(__name__)
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when the server is already running its maximum number of sessions."""
+
+
+class SessionManager:
+    """Tracks onboarding sessions by id and enforces a cap on concurrent ones.
+
+    Finished sessions are kept (up to `keep_finished`) so their status and
+    persona can still be looked up after the stream ends.
+    """
+
+    def __init__(self, factory, max_sessions=4, keep_finished=50):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.keep_finished = keep_finished
+        self._sessions = OrderedDict()
+        self._starting = 0
+        self._lock = threading.Lock()
+
+    def active(self):
+        with self._lock:
+            return [s for s in self._sessions.values() if s.is_running]
+
+    def create(self, **kwargs):
+        # Reserve the slot before building the session so two concurrent
+        # /start calls can't both squeeze past the limit; the build itself
+        # (which may load models on first use) happens outside the lock
+        with self._lock:
+            running = sum(1 for s in self._sessions.values() if s.is_running) + self._starting
+            if running >= self.max_sessions:
+                raise SessionLimitError(f"{running} sessions already running (limit {self.max_sessions})")
+            self._starting += 1
+
+        try:
+            session = self.factory(**kwargs)
+        finally:
+            with self._lock:
+                self._starting -= 1
+
+        with self._lock:
+            session.is_running = True
+            self._sessions[session.session_id] = session
+            self._evict_finished()
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _evict_finished(self):
+        finished = [sid for sid, s in self._sessions.items() if not s.is_running]
+        for sid in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._sessions[sid]
+
+    def release(self, session, status="cancelled"):
+        """Free the slot of a session from create() whatever became of its stream.
+
+        Safe to call after the stream has finished (close() is idempotent);
+        this covers a client that went away before the stream ever started.
+        """
+        session.close(status)
+
+    def stream(self, session):
+        """Wrap session.run() for SSE: announce the id, trace each step, surface overload as an event."""
+        status = None
+        try:
+            # Inside the try: a client can disconnect right after this first event
+            yield f"SESSION: {session.session_id}"
+            yield from session.trace.wrap(session.run())
+        except GeneratorExit:
+            status = "cancelled"
+            raise
+        except ModelBusyError as e:
+            log.warning("⚠️ Session %s rejected by model pool: %s", session.session_id, e)
+            status = "rejected"
+            yield f"ERROR: Server is busy, please try again shortly ({e})"
+        finally:
+            session.close(status)
+
+    async def astream(self, session):
+        """Async counterpart of stream() for the asyncio session engine."""
+        status = None
+        try:
+            yield f"SESSION: {session.session_id}"
+            async for event in session.trace.awrap(session.arun()):
+                yield event
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away mid-session
+            status = "cancelled"
+            raise
+        except ModelBusyError as e:
+            log.warning("⚠️ Session %s rejected by model pool: %s", session.session_id, e)
+            status = "rejected"
+            yield f"ERROR: Server is busy, please try again shortly ({e})"
+        finally:
+            session.close(status)
+
+    def summary(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "running": any(s.is_running for s in sessions),
+            "active_sessions": sum(1 for s in sessions if s.is_running),
+            "max_sessions": self.max_sessions,
+        }
@@ -0,0 +1,175 @@
+"""Speculative LLM generation on partial transcripts.
+
+When the user pauses mid-turn, the audio so far is transcribed and a
+candidate reply is started on that partial text while the VAD is still
+waiting out its trailing silence and Whisper runs on the full utterance.
+If the final transcript matches the partial one closely enough, the
+candidate (with whatever tokens it has already produced) becomes the reply;
+otherwise it is cancelled.
+
+Candidates are tagged with the sequence number of the utterance they were
+started for. One that only gets going after that utterance's reply has
+been decided is dropped, so it can never be served on a later turn.
+"""
+import difflib
+import logging
+import re
+import threading
+import time
+
+from modules.llm import reply_stream
+from modules.telemetry import REGISTRY, bind_context
+
+log = logging.getLogger(__name__)
+
+SPECULATIONS = REGISTRY.counter("voice_speculation_total", "Speculative LLM candidates by outcome", ["outcome"])
+SAVED_SECONDS = REGISTRY.histogram(
+    "voice_speculation_saved_seconds", "Head start a reused candidate had on the real LLM call",
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0),
+)
+
+
+def _words(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def similarity(partial, final):
+    """Word-level similarity in [0, 1] ignoring case and punctuation."""
+    a, b = _words(partial), _words(final)
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class Candidate:
+    """An LLM generation running on a background thread, replayable as a stream."""
+
+    def __init__(self, text, prompt, llm, seq=None):
+        self.text = text
+        self.seq = seq
+        self.started_at = time.perf_counter()
+        self.tokens = []
+        self.finished = False
+        self._cancelled = threading.Event()
+        self._cond = threading.Condition()
+        threading.Thread(target=bind_context(self._run), args=(llm, prompt), daemon=True).start()
+
+    def _run(self, llm, prompt):
+        # Like the regular reply, a failed call ends in the spoken apology
+        stream = reply_stream(llm, prompt)
+        try:
+            for token in stream:
+                if self._cancelled.is_set():
+                    break
+                with self._cond:
+                    self.tokens.append(token)
+                    self._cond.notify_all()
+        finally:
+            stream.close()
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def stream(self):
+        """Yield every token so far, then the rest as it arrives."""
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self.tokens) and not self.finished:
+                    self._cond.wait()
+                if position >= len(self.tokens):
+                    return
+                token = self.tokens[position]
+            position += 1
+            yield token
+
+
+class Speculator:
+    """Starts at most one candidate at a time, and at most `max_calls` per session.
+
+    `prompt_for(text)` builds the prompt the session would send if `text`
+    were the user's final words.
+    """
+
+    def __init__(self, llm, prompt_for, max_calls=20, threshold=0.9):
+        self.llm = llm
+        self.prompt_for = prompt_for
+        self.max_calls = max_calls
+        self.threshold = threshold
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.capped = 0
+        self.late = 0
+        self.saved_seconds = 0.0
+        self._candidate = None
+        self._decided = None  # Sequence number of the last utterance take() was called for
+        self._lock = threading.Lock()
+
+    def _is_late(self, seq):
+        return seq is not None and self._decided is not None and seq <= self._decided
+
+    def start(self, partial_text, seq=None):
+        """Start a candidate for `partial_text` of utterance `seq`, replacing any earlier one."""
+        with self._lock:
+            if self._is_late(seq):
+                # The final transcript got there first; nobody would ever take this
+                self.late += 1
+                SPECULATIONS.inc(outcome="late")
+                return None
+            if self._candidate is not None:
+                self._candidate.cancel()
+                self._candidate = None
+                self.misses += 1
+                SPECULATIONS.inc(outcome="superseded")
+            if self.calls >= self.max_calls:
+                self.capped += 1
+                SPECULATIONS.inc(outcome="capped")
+                return None
+            self.calls += 1
+            self._candidate = Candidate(partial_text, self.prompt_for(partial_text), self.llm, seq)
+            return self._candidate
+
+    def take(self, final_text, seq=None):
+        """The running candidate if it was started for utterance `seq` and
+        matches `final_text`, else None (and cancel it)."""
+        with self._lock:
+            if seq is not None:
+                self._decided = seq if self._decided is None else max(self._decided, seq)
+            candidate, self._candidate = self._candidate, None
+            if candidate is None:
+                return None
+            same_utterance = seq is None or candidate.seq is None or candidate.seq == seq
+            if same_utterance and similarity(candidate.text, final_text) >= self.threshold:
+                saved = time.perf_counter() - candidate.started_at
+                self.hits += 1
+                self.saved_seconds += saved
+                SPECULATIONS.inc(outcome="hit")
+                SAVED_SECONDS.observe(saved)
+                return candidate
+            candidate.cancel()
+            self.misses += 1
+            SPECULATIONS.inc(outcome="miss")
+            return None
+
+    def cancel(self):
+        with self._lock:
+            if self._candidate is not None:
+                self._candidate.cancel()
+                self._candidate = None
+
+    def stats(self):
+        with self._lock:
+            decided = self.hits + self.misses
+            return {
+                "calls": self.calls,
+                "hits": self.hits,
+                "misses": self.misses,
+                "capped": self.capped,
+                "late": self.late,
+                "hit_rate": round(self.hits / decided, 3) if decided else None,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
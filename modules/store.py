@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL DEFAULT 'running',
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (session_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS personas (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_source ON sessions(source);
+"""
+
+
+class SessionStore:
+    """SQLite (WAL) store for sessions, their turns and personas.
+
+    Turns are appended as they happen and committed in small batches (every
+    `batch_size` turns or `flush_interval` seconds), so a crash loses at
+    most one batch instead of the whole session. Latest and by-id lookups
+    go through primary keys, and listing is keyset-paginated.
+    """
+
+    def __init__(self, path="output/sessions.db", batch_size=8, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._lock = threading.RLock()
+        self._pending = []
+        self._next_idx = {}
+        self._last_flush = time.monotonic()
+        self._flusher = threading.Thread(target=self._flush_loop, name="store-flush", daemon=True)
+        self._flusher.start()
+
+    # -- writes --------------------------------------------------------------
+
+    def create_session(self, session_id, source=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (id, created_at, source) VALUES (?, ?, ?)",
+                (session_id, time.time(), source),
+            )
+            self._next_idx[session_id] = 0
+
+    def append_turn(self, session_id, role, text):
+        with self._lock:
+            if session_id not in self._next_idx:
+                row = self._conn.execute(
+                    "SELECT COALESCE(MAX(idx) + 1, 0) FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                self._next_idx[session_id] = row[0]
+            idx = self._next_idx[session_id]
+            self._next_idx[session_id] = idx + 1
+            self._pending.append((session_id, idx, role, text, time.time()))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO turns (session_id, idx, role, text, ts) VALUES (?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                with self._lock:
+                    if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+                        self._flush_locked()
+            except sqlite3.Error as e:
+                log.error("❌ Failed to flush turns: %s", e)
+
+    def finish_session(self, session_id, status="complete"):
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute(
+                "UPDATE sessions SET finished_at = ?, status = ? WHERE id = ?",
+                (time.time(), status, session_id),
+            )
+            self._next_idx.pop(session_id, None)
+
+    def save_persona(self, session_id, persona):
+        with self._lock:
+            self._conn.execute("DELETE FROM personas WHERE session_id = ?", (session_id,))
+            self._conn.execute(
+                "INSERT INTO personas (session_id, created_at, data) VALUES (?, ?, ?)",
+                (session_id, time.time(), json.dumps(persona, ensure_ascii=False)),
+            )
+
+    # -- reads ---------------------------------------------------------------
+
+    def get_session(self, session_id):
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_transcript(self, session_id):
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT role, text, ts FROM turns WHERE session_id = ? ORDER BY idx", (session_id,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_persona(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM personas WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def find_by_source(self, source, status=None):
+        """Most recent session created from `source`, optionally only with `status`."""
+        query = "SELECT * FROM sessions WHERE source = ?"
+        params = [source]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY seq DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def latest_session(self):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions ORDER BY seq DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def latest_persona(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, data FROM personas ORDER BY seq DESC LIMIT 1"
+            ).fetchone()
+        if not row:
+            return None
+        return row["session_id"], json.loads(row["data"])
+
+    def list_sessions(self, limit=20, before=None):
+        """Newest first; pass the last page's `next_before` to get the next page."""
+        with self._lock:
+            if before is None:
+                rows = self._conn.execute(
+                    "SELECT * FROM sessions ORDER BY seq DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM sessions WHERE seq < ? ORDER BY seq DESC LIMIT ?", (before, limit)
+                ).fetchall()
+        sessions = [dict(r) for r in rows]
+        next_before = sessions[-1]["seq"] if len(sessions) == limit else None
+        return {"sessions": sessions, "next_before": next_before}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide SessionStore (path from SESSION_DB)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(os.getenv("SESSION_DB", "output/sessions.db"))
+        return _store
@@ -1,28 +1,132 @@
-import whisper
+import logging
+import os
+import time
 import numpy as np
-import sounddevice as sd
+from modules.audio_buffer import get_audio_input
+from modules.vad import EnergyVAD
+from modules.model_pool import get_pool
+from modules.telemetry import span
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "small")
+# Off by default: with local speakers the backlog is mostly the AI's own reply
+DEFAULT_BACKLOG = float(os.getenv("STT_BACKLOG_SECONDS", "0"))
 
 class STT:
-    def __init__(self, model="small"):
-        print("🧠 Loading Whisper STT model...")
-        self.model = whisper.load_model(model)
-        print("✅ Whisper model loaded!")
+    def __init__(self, model=DEFAULT_MODEL, use_vad=True, vad_config=None, source=None, audio=None,
+                 max_backlog=DEFAULT_BACKLOG):
+        # Whisper is shared process-wide; pass a loaded model to bypass the pool
+        if isinstance(model, str):
+            self.model = get_pool().whisper(model)
+        else:
+            self.model = model
+        log.info("✅ Whisper model ready!")
+
+        # VAD endpointing: stop recording as soon as the user stops talking
+        self.use_vad = use_vad
+        self.vad_config = vad_config or {}
+        self.last_timings = {}
+
+        # Optional replacement for the microphone: anything with
+        # capture(max_duration, sample_rate) -> float32 array (see modules/fakes.py)
+        self.source = source
+
+        # Otherwise audio comes from the shared, always-on input stream. Each
+        # listen() starts from now, or keeps up to max_backlog seconds of what
+        # was said while the AI was talking (only with a headset or echo
+        # cancellation, or the AI's reply is transcribed as the user's turn)
+        self.audio = audio if audio is not None or source is not None else get_audio_input()
+        self.max_backlog = max_backlog
+        self._cursor = None
 
     def listen(self, duration=8, sample_rate=16000):
-        print("🎤 Listening...")
-        audio = sd.rec(int(duration * sample_rate), samplerate=sample_rate, channels=1, dtype='float32')
-        sd.wait()
+        """Record one turn and transcribe it.
 
-        # Whisper expects 16kHz mono
-        audio = audio.squeeze()
+        With VAD enabled, `duration` is the upper bound on the turn rather
+        than a fixed recording length.
+        """
+        log.debug("🎤 Listening...")
+        with span("stt.listen"):
+            start = time.perf_counter()
+            with span("stt.capture"):
+                if self.source is not None:
+                    audio = self.source.capture(duration, sample_rate)
+                elif self.use_vad:
+                    audio = self.capture(duration, sample_rate)
+                else:
+                    # Fixed-length recording from now on, straight out of the ring
+                    cursor = self._reader(sample_rate)
+                    cursor.skip_to_now()
+                    audio = cursor.read_blocking(int(duration * sample_rate))
+            captured = time.perf_counter()
+
+            text = self.transcribe(audio)
+        self.last_timings = {
+            "capture": captured - start,
+            "transcribe": time.perf_counter() - captured,
+            "speech_seconds": len(audio) / sample_rate,
+        }
+        return text
+
+    def _reader(self, sample_rate):
+        if self.audio.sample_rate != sample_rate:
+            raise ValueError(f"Audio input runs at {self.audio.sample_rate} Hz, not {sample_rate} Hz")
+        if self._cursor is None:
+            self._cursor = self.audio.cursor()
+        return self._cursor
+
+    def capture(self, max_duration=15, sample_rate=16000):
+        """Run microphone audio through the VAD and return only the speech."""
+        vad = EnergyVAD(sample_rate=sample_rate, **self.vad_config)
+        max_frames = int(max_duration * sample_rate / vad.frame_size)
+        chunks = []
+
+        cursor = self._reader(sample_rate)
+        cursor.skip_to_now(self.max_backlog)
+        dropped = cursor.dropped
+        for _ in range(max_frames):
+            # Views into the ring; they stay valid far longer than one turn
+            frame = cursor.read_blocking(vad.frame_size)
+            chunks.append(frame)
+            if vad.process(frame):
+                break
+        if cursor.dropped > dropped:
+            log.warning("⚠️ Fell behind the microphone, %d samples dropped", cursor.dropped - dropped)
+
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return vad.trim(np.concatenate(chunks))
+
+    def transcribe(self, audio):
+        """Transcribe a 16kHz mono float32 array."""
+        if len(audio) == 0:
+            log.info("🔇 I didn't catch that.")
+            return ""
 
         # Transcribe (disable fp16 on CPU)
-        result = self.model.transcribe(audio, fp16=False)
+        with span("stt.transcribe", audio_seconds=round(len(audio) / 16000, 2)):
+            result = self.model.transcribe(audio.astype(np.float32), fp16=False)
         text = result["text"].strip()
 
         if text:
-            print(f"🧑‍🦰 You said: {text}")
+            log.info("🧑‍🦰 You said: %s", text)
         else:
-            print("🔇 I didn't catch that.")
+            log.info("🔇 I didn't catch that.")
 
         return text
+
+    def try_transcribe(self, audio):
+        """Transcribe only if the shared Whisper is idle; None instead of waiting.
+
+        For speculative work, which must never queue ahead of a real turn.
+        """
+        if len(audio) == 0:
+            return ""
+        try_model = getattr(self.model, "try_transcribe", None)
+        if try_model is None:
+            # Not pooled: nothing shared to queue behind
+            try_model = self.model.transcribe
+        with span("stt.transcribe_speculative", audio_seconds=round(len(audio) / 16000, 2)):
+            result = try_model(audio.astype(np.float32), fp16=False)
+        return None if result is None else result["text"].strip()
@@ -0,0 +1,336 @@
+"""Per-turn tracing spans and Prometheus metrics.
+
+`span("stt.listen")` times a block of code. The duration always goes into
+the `voice_stage_seconds` histogram; when a SessionTrace is active in the
+current context it is also recorded on that session, tagged with the turn
+number. Worker threads see the trace if they are started with a copy of
+the caller's context (see `bind_context`).
+
+Metrics are kept in-process and rendered in the Prometheus text format by
+`render_metrics()` (served at /metrics).
+"""
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from collections import deque
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(names, labels):
+    return tuple(str(labels.get(n, "")) for n in names)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labels, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = _label_key(self.labels, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labels, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labels, key, [("le", repr(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("voice_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+STAGE_ERRORS = REGISTRY.counter("voice_stage_errors_total", "Pipeline stages that raised", ["stage"])
+TURNS = REGISTRY.counter("voice_turns_total", "User turns handled")
+SESSIONS = REGISTRY.counter("voice_sessions_total", "Finished sessions by status", ["status"])
+
+
+def render_metrics():
+    return REGISTRY.render()
+
+
+# -- tracing -------------------------------------------------------------------
+
+_current = contextvars.ContextVar("voice_trace", default=None)
+
+
+def current_trace():
+    return _current.get()
+
+
+def bind_context(func):
+    """Bind `func` to a copy of the current context, for handing to another thread."""
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+class SessionTrace:
+    """Timing spans recorded for one session, keyed by turn.
+
+    Activate it around the session's steps (`wrap()` / `awrap()` do this for
+    an event generator) so spans opened anywhere below are attributed to it.
+    """
+
+    def __init__(self, session_id, max_spans=2000, profiler=None):
+        self.session_id = session_id
+        self.turn = 0
+        self.spans = deque(maxlen=max_spans)
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        if profiler is not None:
+            profiler.start()
+
+    def next_turn(self):
+        self.turn += 1
+
+    def record(self, name, start, duration, error=None, **attrs):
+        span = {"name": name, "turn": self.turn, "start": start, "seconds": duration}
+        if error:
+            span["error"] = error
+        span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def activate(self):
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def wrap(self, events):
+        """Iterate a generator with this trace active for each step."""
+        try:
+            while True:
+                with self.activate():
+                    try:
+                        event = next(events)
+                    except StopIteration:
+                        return
+                yield event
+        finally:
+            with self.activate():
+                events.close()
+
+    async def awrap(self, events):
+        """Async counterpart of wrap()."""
+        try:
+            while True:
+                with self.activate():
+                    try:
+                        event = await events.__anext__()
+                    except StopAsyncIteration:
+                        return
+                yield event
+        finally:
+            with self.activate():
+                await events.aclose()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.spans)
+
+    def summary(self):
+        """Seconds per stage for each turn, e.g. {"3": {"stt.listen": 2.1, ...}}."""
+        turns = {}
+        with self._lock:
+            for span in self.spans:
+                stages = turns.setdefault(str(span["turn"]), {})
+                stages[span["name"]] = round(stages.get(span["name"], 0.0) + span["seconds"], 4)
+        return turns
+
+    def close(self, status):
+        SESSIONS.inc(status=status)
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as pipeline stage `name`."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            error = type(e).__name__
+            STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, start=start, error=error, **attrs)
+
+
+def observe(name, seconds, start=None, error=None, **attrs):
+    """Record a duration measured elsewhere (e.g. time to first token)."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _current.get()
+    if trace is not None:
+        trace.record(name, start if start is not None else time.perf_counter() - seconds, seconds, error, **attrs)
+    log.debug("%s took %.1f ms", name, seconds * 1000)
+
+
+# -- profiling -----------------------------------------------------------------
+
+class SamplingProfiler:
+    """Samples every thread's stack at `interval` and writes collapsed stacks.
+
+    The output (`frame;frame;frame count` per line) loads into flamegraph.pl
+    or speedscope. Sampling is process-wide, so with several sessions
+    running at once the profile covers all of them.
+    """
+
+    def __init__(self, path, interval=0.01):
+        self.path = path
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        log.info("Wrote profile with %d samples to %s", sum(self.samples.values()), self.path)
+
+
+def _default_profiler(session_id):
+    if os.getenv("PROFILE_SESSIONS", "0") == "0":
+        return None
+    interval = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+    return SamplingProfiler(f"output/profiles/{session_id}.folded", interval)
+
+
+_profiler_factory = _default_profiler
+
+
+def set_profiler_factory(factory):
+    """Install a hook `factory(session_id) -> profiler or None`.
+
+    A profiler needs start() and stop(); it runs for the whole session.
+    The default samples stacks when PROFILE_SESSIONS=1.
+    """
+    global _profiler_factory
+    _profiler_factory = factory or _default_profiler
+
+
+def profiler_for(session_id):
+    return _profiler_factory(session_id)
@@ -1,25 +1,312 @@
-from piper import PiperVoice
+import logging
 import numpy as np
-import sounddevice as sd
 import os
+import queue
+import threading
+import time
+from modules.model_pool import get_pool
+from modules.telemetry import bind_context, observe, span
+from modules.tts_cache import TTSCache, get_cache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_VOICE = "models/piper/en_US-lessac-medium.onnx"
+
+_END = object()
+
+
+class SoundDeviceSink:
+    """Plays float32 blocks on the default output device."""
+
+    def __init__(self):
+        self.stream = None
+
+    def open(self, sample_rate):
+        # Imported here so servers that only stream to remote clients don't need PortAudio
+        import sounddevice as sd
+
+        self.stream = sd.OutputStream(samplerate=sample_rate, channels=1, dtype='float32')
+        self.stream.start()
+
+    def write(self, block):
+        self.stream.write(block.reshape(-1, 1))
+
+    def close(self, abort=False):
+        if self.stream is None:
+            return
+        if abort:
+            self.stream.abort()
+        else:
+            self.stream.stop()  # Blocks until queued audio has played
+        self.stream.close()
+        self.stream = None
+
+
+class SpeechHandle:
+    """Handle for an in-progress `TTS.speak_async` call.
+
+    Text can be fed in pieces (e.g. sentence by sentence) until `finish()`
+    is called. `wait()` blocks until playback ends; `cancel()` stops it.
+    """
+
+    def __init__(self):
+        self._texts = queue.Queue()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self.started_at = time.perf_counter()
+        self.first_sample_at = None
+        self.samples_played = 0
+        self.synthesis_seconds = 0.0
+        self.sample_rate = None
+        self.error = None
+
+    def feed(self, text, cache=False):
+        """Queue text to speak; `cache=True` stores its audio for reuse."""
+        if text and text.strip():
+            self._texts.put((text, cache))
+
+    def finish(self):
+        self._texts.put(_END)
+
+    def cancel(self):
+        self._cancelled.set()
+        self._texts.put(_END)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def time_to_first_sample(self):
+        if self.first_sample_at is None:
+            return None
+        return self.first_sample_at - self.started_at
+
 
 class TTS:
-    def __init__(self, model_path="models/piper/en_US-lessac-medium.onnx"):
+    def __init__(self, model_path=DEFAULT_VOICE, streaming=True,
+                 prebuffer_ms=150, block_ms=50, sink=None, voice=None, synthesis_params=None,
+                 cache=None):
         self.model_path = model_path
 
-        if not os.path.exists(self.model_path):
-            raise RuntimeError(f"❌ Model not found at {self.model_path}")
+        if voice is not None:
+            self.voice = voice
+        else:
+            if not os.path.exists(self.model_path):
+                raise RuntimeError(f"❌ Model not found at {self.model_path}")
+
+            # One Piper voice is shared by every session in the process
+            self.voice = get_pool().voice(self.model_path)
+            log.info("✅ Voice model ready!")
+
+        # Streaming playback settings: how much audio to buffer before the
+        # first write (jitter buffer) and the size of each write
+        self.streaming = streaming
+        self.prebuffer_ms = prebuffer_ms
+        self.block_ms = block_ms
+        self.sink_factory = sink or SoundDeviceSink
+        self.last_time_to_first_sample = None
+
+        # Piper SynthesisConfig fields (length_scale, noise_scale, ...); part of the cache key
+        self.synthesis_params = synthesis_params or {}
+        # Audio cache for fixed lines; pass cache=False to disable
+        self.cache = get_cache() if cache is None else (cache or None)
+
+    def _synthesize(self, text):
+        if not self.synthesis_params:
+            return self.voice.synthesize(text)
+        from piper import SynthesisConfig
+
+        return self.voice.synthesize(text, syn_config=SynthesisConfig(**self.synthesis_params))
+
+    def _cache_key(self, text):
+        return TTSCache.key(text, self.model_path, self.synthesis_params)
+
+    def render(self, text, cache=True):
+        """Synthesize text to (sample_rate, audio) without playing it, using the cache."""
+        if self.cache is not None:
+            hit = self.cache.get(self._cache_key(text))
+            if hit is not None:
+                return hit
+
+        chunks = list(self._synthesize(text))
+        if not chunks:
+            return None
+        sample_rate = chunks[0].sample_rate
+        audio = np.concatenate([c.audio_float_array for c in chunks])
+        if cache and self.cache is not None:
+            self.cache.put(self._cache_key(text), sample_rate, audio, text=text)
+        return sample_rate, audio
+
+    def speak(self, text, cache=False):
+        """Speak text, blocking until playback finishes.
+
+        Use `cache=True` for fixed lines that are spoken in every session.
+        """
+        with span("tts.speak", chars=len(text)):
+            if self.streaming:
+                self.speak_async(text, cache=cache).wait()
+                return
+            self._speak_buffered(text)
+
+    def speak_async(self, text=None, cache=False):
+        """Start speaking without blocking and return a SpeechHandle.
+
+        Pass `text` to speak a complete utterance, or leave it out and
+        `feed()` pieces into the handle as they become available.
+        """
+        handle = SpeechHandle()
+        if text is not None:
+            log.info("🤖 AI says: %s", text)
+            handle.feed(text, cache=cache)
+            handle.finish()
+
+        chunks = queue.Queue(maxsize=32)
+        # Workers inherit the caller's context so their spans land on its session trace
+        threading.Thread(target=bind_context(self._synthesize_worker), args=(handle, chunks), daemon=True).start()
+        threading.Thread(target=bind_context(self._playback_worker), args=(handle, chunks), daemon=True).start()
+        return handle
+
+    def _put(self, handle, chunks, item):
+        # Bounded queue so synthesis never runs unboundedly ahead of playback
+        while not handle.cancelled:
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _synthesize_worker(self, handle, chunks):
+        try:
+            while not handle.cancelled:
+                item = handle._texts.get()
+                if item is _END:
+                    break
+                text, cacheable = item
+
+                # Cache hit: straight to playback, no ONNX inference
+                key = self._cache_key(text) if self.cache is not None else None
+                hit = self.cache.get(key) if key else None
+                if hit is not None:
+                    log.debug("💾 Cache hit: %d samples", len(hit[1]))
+                    self._put(handle, chunks, hit)
+                    continue
+
+                rendered = []
+                sample_rate = None
+                started = time.perf_counter()
+                for i, chunk in enumerate(self._synthesize(text)):
+                    handle.synthesis_seconds += time.perf_counter() - started
+                    if handle.cancelled:
+                        break
+                    log.debug("📦 Chunk %d: synthesized %d samples", i, len(chunk.audio_float_array))
+                    sample_rate = chunk.sample_rate
+                    if cacheable:
+                        rendered.append(chunk.audio_float_array)
+                    if not self._put(handle, chunks, (chunk.sample_rate, chunk.audio_float_array)):
+                        break
+                    started = time.perf_counter()
+
+                if cacheable and key and rendered and not handle.cancelled:
+                    self.cache.put(key, sample_rate, np.concatenate(rendered), text=text)
+        except Exception as e:
+            log.error("❌ Error synthesizing speech: %s", e)
+            handle.error = e
+        finally:
+            if handle.synthesis_seconds:
+                observe("tts.synthesize", handle.synthesis_seconds)
+            # Always unblock the playback thread. Normally _END waits for room
+            # behind the last chunks; only after a cancel (when playback stops
+            # reading) is queued audio thrown away to make room
+            while True:
+                try:
+                    chunks.put(_END, timeout=0.1)
+                    break
+                except queue.Full:
+                    if not handle.cancelled:
+                        continue
+                    try:
+                        chunks.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _playback_worker(self, handle, chunks):
+        sink = None
+        try:
+            pending = []
+            buffered = 0
+            ended = False
+
+            # Jitter buffer: hold back until prebuffer_ms of audio is ready
+            while not ended and not handle.cancelled:
+                item = chunks.get()
+                if item is _END:
+                    ended = True
+                    break
+                sample_rate, audio = item
+                if handle.sample_rate is None:
+                    handle.sample_rate = sample_rate
+                pending.append(audio)
+                buffered += len(audio)
+                if buffered >= handle.sample_rate * self.prebuffer_ms / 1000:
+                    break
+
+            if handle.cancelled or handle.sample_rate is None:
+                if handle.sample_rate is None and not handle.cancelled:
+                    log.error("❌ No audio data generated!")
+                return
+
+            sink = self.sink_factory()
+            sink.open(handle.sample_rate)
+            block = max(1, int(handle.sample_rate * self.block_ms / 1000))
 
-        print(f"🔊 Loading voice model from {self.model_path}...")
-        self.voice = PiperVoice.load(self.model_path)
-        print("✅ Voice model loaded successfully!")
+            while not handle.cancelled:
+                for audio in pending:
+                    for start in range(0, len(audio), block):
+                        if handle.cancelled:
+                            break
+                        sink.write(np.ascontiguousarray(audio[start:start + block], dtype=np.float32))
+                        if handle.first_sample_at is None:
+                            handle.first_sample_at = time.perf_counter()
+                            self.last_time_to_first_sample = handle.time_to_first_sample
+                            observe("tts.first_audio", handle.time_to_first_sample)
+                        handle.samples_played += min(block, len(audio) - start)
+                pending = []
+                if ended:
+                    break
+                item = chunks.get()
+                if item is _END:
+                    ended = True
+                    continue
+                pending.append(item[1])
+        except Exception as e:
+            log.error("❌ Error playing speech: %s", e)
+            handle.error = e
+            handle.cancel()
+        finally:
+            if sink is not None:
+                try:
+                    sink.close(abort=handle.cancelled)
+                except Exception as e:
+                    log.error("❌ Error closing audio output: %s", e)
+            if not handle.cancelled:
+                log.debug("✅ Speech complete!")
+            handle._done.set()
 
-    def speak(self, text):
+    def _speak_buffered(self, text):
         """Speak text using correct audio extraction from AudioChunk."""
-        print(f"🤖 AI says: {text}")
+        log.info("🤖 AI says: %s", text)
 
         # Synthesize returns a generator of AudioChunk objects
-        audio_generator = self.voice.synthesize(text)
+        audio_generator = self._synthesize(text)
 
         # List to store audio chunks
         audio_arrays = []
@@ -36,18 +323,20 @@ class TTS:
             # Append to list
             audio_arrays.append(float_array)
 
-            print(f"📦 Chunk {i}: added {len(float_array)} samples")
+            log.debug("📦 Chunk %d: added %d samples", i, len(float_array))
 
         # 🔔 Concatenate only if we have data
         if len(audio_arrays) == 0:
-            print("❌ No audio data generated!")
+            log.error("❌ No audio data generated!")
             return
 
         # ✅ Concatenate all audio chunks
         full_audio = np.concatenate(audio_arrays)
 
         # 🔊 Play the audio
-        print(f"🔊 Playing {len(full_audio)} total samples at {sample_rate} Hz...")
-        sd.play(full_audio, samplerate=sample_rate)
-        sd.wait()  # Wait until speech finishes
-        print("✅ Speech complete!")
+        log.debug("🔊 Playing %d total samples at %d Hz...", len(full_audio), sample_rate)
+        sink = self.sink_factory()
+        sink.open(sample_rate)
+        sink.write(full_audio.astype(np.float32))
+        sink.close()  # Waits until speech finishes
+        log.debug("✅ Speech complete!")
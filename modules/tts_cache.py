@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TTSCache:
+    """Two-tier cache of synthesized speech.
+
+    Entries are keyed by (text, voice model, synthesis params). The memory
+    tier is a small LRU; the disk tier stores raw float32 PCM that is read
+    back with np.memmap, so a hit costs a page-cache lookup instead of ONNX
+    inference. The disk tier is evicted least-recently-used once it grows
+    past `max_disk_mb`.
+    """
+
+    def __init__(self, cache_dir="output/tts_cache", max_memory_items=128, max_disk_mb=512):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._disk_bytes = sum(
+            e.stat().st_size for e in os.scandir(self.cache_dir) if e.name.endswith(".f32")
+        )
+
+    @staticmethod
+    def key(text, voice, params=None):
+        # The full resolved path: voices in different directories often
+        # share a file name (model.onnx, en_US-medium.onnx)
+        payload = json.dumps([text.strip(), os.path.realpath(voice), params or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".f32", base + ".json"
+
+    def get(self, key):
+        """Return (sample_rate, audio) or None."""
+        pcm_path, meta_path = self._paths(key)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            # Memory hits count as use too, or the most-used phrases would
+            # look stalest on disk and be evicted first
+            try:
+                os.utime(pcm_path)
+            except OSError:
+                pass
+            return entry
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                sample_rate = json.load(f)["sample_rate"]
+            audio = np.memmap(pcm_path, dtype=np.float32, mode="r")
+            os.utime(pcm_path)  # Recency for disk eviction
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        entry = (sample_rate, audio)
+        with self._lock:
+            self.hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, sample_rate, audio, text=""):
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        pcm_path, meta_path = self._paths(key)
+
+        # Write to unique temp files and rename so readers never see partial
+        # files, even with several sessions caching the same phrase at once
+        tmp_pcm = self._temp_file()
+        tmp_meta = self._temp_file()
+        try:
+            audio.tofile(tmp_pcm)
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({"sample_rate": sample_rate, "samples": len(audio), "text": text}, f)
+            with self._lock:
+                # Replacing an entry only changes the total by the difference
+                try:
+                    replaced = os.stat(pcm_path).st_size
+                except FileNotFoundError:
+                    replaced = 0
+                os.replace(tmp_pcm, pcm_path)
+                os.replace(tmp_meta, meta_path)
+                self._disk_bytes += audio.nbytes - replaced
+                self._remember(key, (sample_rate, audio))
+        finally:
+            for path in (tmp_pcm, tmp_meta):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._evict_disk()
+
+    def _temp_file(self):
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        return path
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = sorted(
+            (e for e in os.scandir(self.cache_dir) if e.name.endswith(".f32")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        total = sum(e.stat().st_size for e in entries)
+        for e in entries:
+            if total <= self.max_disk_bytes:
+                break
+            size = e.stat().st_size
+            key = e.name[:-len(".f32")]
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._memory.pop(key, None)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide TTS cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache(
+                cache_dir=os.getenv("TTS_CACHE_DIR", "output/tts_cache"),
+                max_memory_items=int(os.getenv("TTS_CACHE_ITEMS", "128")),
+                max_disk_mb=float(os.getenv("TTS_CACHE_MB", "512")),
+            )
+        return _cache
@@ -1,11 +1,100 @@
 import os
+import uuid
+import wave
 from datetime import datetime
+import numpy as np
 
 def generate_session_id():
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Timestamp keeps ids sortable; the random suffix keeps sessions started
+    # in the same second apart
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
 def save_json(data, path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w', encoding='utf-8') as f:
         import json
         json.dump(data, f, indent=2, ensure_ascii=False)
+
+def load_wav(path, sample_rate=16000):
+    """Load a PCM WAV file as mono float32 at `sample_rate` (what Whisper expects)."""
+    with wave.open(str(path), "rb") as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+
+    if width == 2:
+        audio = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        audio = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {path}")
+
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+
+    return resample(audio, rate, sample_rate)
+
+def resample(audio, rate, sample_rate):
+    """Resample mono float32 audio from `rate` to `sample_rate`."""
+    if rate == sample_rate or not len(audio):
+        return audio
+    # Linear resampling is plenty for speech going into Whisper
+    target_len = int(round(len(audio) * sample_rate / rate))
+    positions = np.linspace(0, len(audio) - 1, target_len)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+class StreamResampler:
+    """Resample a stream of mono float32 blocks from `rate` to `sample_rate`.
+
+    Polyphase FIR resampling with a Kaiser-windowed sinc low-pass, so
+    downsampling (e.g. 48 kHz clients) doesn't alias. The filter history and
+    output phase carry over from one `process()` call to the next, so block
+    boundaries leave no discontinuities. Adds a delay of half the filter,
+    a few milliseconds.
+    """
+
+    def __init__(self, rate, sample_rate, taps=16, beta=8.0, rolloff=0.9):
+        self.rate = rate
+        self.sample_rate = sample_rate
+        divisor = np.gcd(int(rate), int(sample_rate))
+        self.up = int(sample_rate) // divisor
+        self.down = int(rate) // divisor
+        # Input samples per output: the filter gets longer when downsampling
+        self.taps = taps * -(-self.down // self.up)
+        taps = self.taps
+
+        # Low-pass just under the lower Nyquist, designed at the upsampled rate
+        length = taps * self.up
+        cutoff = rolloff * 0.5 / max(self.up, self.down)
+        t = np.arange(length) - (length - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, beta)
+        h *= self.up / h.sum()
+        # phases[p, k] weighs input sample i0 - k for an output at phase p
+        self.phases = h.reshape(taps, self.up).T.astype(np.float32)
+
+        self.history = np.zeros(taps - 1, dtype=np.float32)
+        self.consumed = 0  # Input samples seen before the current block
+        self.produced = 0  # Output samples emitted so far
+
+    def process(self, audio):
+        audio = np.asarray(audio, dtype=np.float32)
+        if self.up == self.down:
+            return audio
+        buffer = np.concatenate([self.history, audio])
+        last = self.consumed + len(audio)  # One past the last input available
+
+        # Every output whose newest input sample has arrived
+        end = (last * self.up + self.down - 1) // self.down
+        n = np.arange(self.produced, end, dtype=np.int64)
+        position = n * self.down
+        newest = position // self.up - self.consumed + self.taps - 1
+        index = newest[:, None] - np.arange(self.taps)[None, :]
+        out = np.einsum("nk,nk->n", self.phases[position % self.up], buffer[index])
+
+        self.history = buffer[len(buffer) - (self.taps - 1):]
+        self.consumed = last
+        self.produced = end
+        return out.astype(np.float32)
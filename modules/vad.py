@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """Frame-level energy VAD used to endpoint a user's turn.
+
+    Audio is fed in small frames; once speech has started, the utterance
+    ends after `trailing_silence_ms` of frames below the threshold.
+    """
+
+    def __init__(
+        self,
+        sample_rate=16000,
+        frame_ms=30,
+        threshold=0.015,
+        min_speech_ms=150,
+        trailing_silence_ms=700,
+        pre_roll_ms=200,
+        noise_adapt=True,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.threshold = threshold
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.trailing_silence_frames = max(1, trailing_silence_ms // frame_ms)
+        self.pre_roll_frames = pre_roll_ms // frame_ms
+        self.noise_adapt = noise_adapt
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.frames_seen = 0
+        self.speech_start = None  # frame index of first voiced frame
+        self.speech_end = None    # frame index after last voiced frame
+        self.triggered = False
+        self.ended = False
+
+    def _effective_threshold(self):
+        if self.noise_floor is None:
+            return self.threshold
+        # Stay a few dB above the ambient level in noisy rooms
+        return max(self.threshold, self.noise_floor * 3.0)
+
+    def is_speech(self, frame):
+        rms = float(np.sqrt(np.mean(np.square(frame, dtype=np.float64)))) if len(frame) else 0.0
+        voiced = rms >= self._effective_threshold()
+
+        if self.noise_adapt and not voiced:
+            if self.noise_floor is None:
+                self.noise_floor = rms
+            else:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return voiced
+
+    def process(self, frame):
+        """Feed one frame. Returns True once the utterance has ended."""
+        index = self.frames_seen
+        self.frames_seen += 1
+        if self.ended:
+            return True
+
+        if self.is_speech(frame):
+            self.speech_frames += 1
+            self.silence_frames = 0
+            if self.speech_start is None:
+                self.speech_start = index
+            self.speech_end = index + 1
+            if self.speech_frames >= self.min_speech_frames:
+                self.triggered = True
+        else:
+            self.silence_frames += 1
+            if not self.triggered:
+                # A short click or breath is not the start of an answer
+                self.speech_frames = 0
+                self.speech_start = None
+                self.speech_end = None
+            elif self.silence_frames >= self.trailing_silence_frames:
+                self.ended = True
+
+        return self.ended
+
+    def speech_bounds(self, total_samples):
+        """Sample range [start, end) covering the detected speech plus pre-roll."""
+        if self.speech_start is None:
+            return None
+        start = max(0, (self.speech_start - self.pre_roll_frames) * self.frame_size)
+        end = min(total_samples, (self.speech_end + self.pre_roll_frames) * self.frame_size)
+        return start, end
+
+    def trim(self, audio):
+        """Cut leading and trailing silence from a finished recording."""
+        bounds = self.speech_bounds(len(audio))
+        if bounds is None:
+            return audio[:0]
+        start, end = bounds
+        return audio[start:end]
+
+
+def frames(audio, frame_size):
+    """Split audio into consecutive frames (the last one may be short)."""
+    for start in range(0, len(audio), frame_size):
+        yield audio[start:start + frame_size]
+
+
+def endpoint(audio, vad):
+    """Run `vad` over a complete recording as if it were streamed.
+
+    Returns (trimmed_audio, endpoint_sample) where endpoint_sample is the
+    position at which live capture would have stopped.
+    """
+    vad.reset()
+    position = 0
+    for frame in frames(audio, vad.frame_size):
+        position += len(frame)
+        if vad.process(frame):
+            break
+    return vad.trim(audio[:position]), position
@@ -0,0 +1,72 @@
+"""CPU inference options for Whisper. All are off by default.
+
+- precision "int8": nn.Linear layers (almost all of Whisper's compute)
+  dynamically quantized to int8 with torch.ao.quantization. Dynamic
+  quantization only runs on CPU, so int8 pins the model there; fp32 keeps
+  Whisper's own device choice (CUDA when available).
+- threads: torch intra-op thread count (process-wide).
+- greedy: utterances up to `short_seconds` are decoded once at temperature
+  0 without the temperature fallback ladder, which otherwise re-decodes an
+  utterance up to five times when its compression ratio or log-prob looks
+  off. Faster on CPU, but gives up that recovery; measure the accuracy
+  cost with scripts/compare_whisper.py before turning it on.
+"""
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "int8")
+
+
+def set_threads(threads):
+    if threads:
+        import torch
+
+        torch.set_num_threads(int(threads))
+
+
+def quantize_int8(model):
+    """Dynamically quantize Whisper's linear layers to int8 (CPU only)."""
+    import torch
+    import whisper.model
+
+    # whisper.model.Linear only adds a dtype cast for fp16; quantize_dynamic
+    # matches exact module types, so hand it plain nn.Linear modules
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper(name="small", precision="fp32", threads=None):
+    """Load a Whisper model at the given precision."""
+    import whisper
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown Whisper precision {precision!r} (expected one of {PRECISIONS})")
+    set_threads(threads)
+    start = time.perf_counter()
+    model = whisper.load_model(name, device="cpu" if precision == "int8" else None)
+    if precision == "int8":
+        model = quantize_int8(model)
+    log.info("🧠 Whisper '%s' (%s) loaded in %.1fs", name, precision, time.perf_counter() - start)
+    return model
+
+
+class WhisperRunner:
+    """Applies the decoding options to every transcribe() call."""
+
+    def __init__(self, model, greedy=False, short_seconds=30.0, sample_rate=16000):
+        self.model = model
+        self.greedy = greedy
+        self.short_seconds = short_seconds
+        self.sample_rate = sample_rate
+
+    def transcribe(self, audio, **kwargs):
+        options = {"fp16": False}
+        if self.greedy and len(audio) <= self.short_seconds * self.sample_rate:
+            # One window, one pass: no fallback, nothing to condition on
+            options.update(temperature=0.0, condition_on_previous_text=False)
+        options.update(kwargs)
+        return self.model.transcribe(audio, **options)
@@ -1,106 +1,300 @@
 import time
 import os
 import json
-from typing import Generator
+import logging
+from typing import AsyncGenerator, Generator
 from modules.stt import STT
 from modules.tts import TTS
-from modules.llm import MistralBot
-from modules.persona_builder import PersonaBuilder
+from modules.llm import reply_stream
+from modules.model_pool import get_pool
+from modules.memory import ConversationMemory
+from modules.persona_builder import IncrementalPersonaExtractor, PersonaBuilder
+from modules.segmenter import stream_sentences
+from modules.speculation import Speculator
+from modules.pipeline import VoicePipeline, run_blocking
+from modules import phrases
+from modules.store import get_store
+from modules.telemetry import TURNS, SessionTrace, profiler_for
 from modules.utils import generate_session_id, save_json
 
+log = logging.getLogger(__name__)
+
 class OnboardingSession:
-    def __init__(self):
+    def __init__(self, llm=None, store=None, stt=None, tts=None, audio=None, sink=None):
         self.transcript = []
         self.is_running = False
         self.session_id = generate_session_id()
+        self.started_at = time.time()
+        self.finished_at = None
+        self.persona = None
+        # Per-turn timing spans (activated by SessionManager while streaming)
+        self.trace = SessionTrace(self.session_id, profiler=profiler_for(self.session_id))
+
+        # Every turn is appended to the session store as it happens
+        self.store = store or get_store()
+        self._closed = False
 
         # Paths
         self.transcript_path = f"output/transcripts/session_{self.session_id}.txt"
         self.persona_path = f"output/personas/user_{self.session_id}.json"
+        self.recording_path = f"output/recordings/session_{self.session_id}.f32"
+        self.recording = None
+
+        # Initialize voice components. `audio` and `sink` replace the local
+        # microphone and speakers, e.g. with a remote client's connection
+        # (modules/remote_audio.py)
+        self.tts = tts or TTS(sink=sink)
+        self.stt = stt or STT(audio=audio)
+        self.llm = llm or get_pool().llm()
 
-        # Initialize voice components
-        self.tts = TTS()
-        self.stt = STT(model="small")
-        self.llm = MistralBot()
+        # Persona draft kept up to date in the background during the chat
+        self.extractor = IncrementalPersonaExtractor(
+            PersonaBuilder(llm=self.llm), self.transcript,
+            every_n_turns=int(os.getenv("PERSONA_UPDATE_TURNS", "6")),
+        )
+        self._draft_version_sent = 0
+
+        # Optional: start the LLM on partial transcripts during pauses (async engine only)
+        self.speculator = None
+        if os.getenv("SPECULATIVE_LLM", "0") != "0":
+            self.speculator = Speculator(
+                self.llm, lambda text: self.memory.prompt(pending=[f"User: {text}"]),
+                max_calls=int(os.getenv("SPECULATIVE_MAX_CALLS", "20")),
+            )
 
         # Load prompt
         with open("prompts/system_prompt.txt", "r") as f:
             self.system_prompt = f.read()
 
+        # Prompt context: system prompt + rolling summary + recent turns
+        self.memory = ConversationMemory(
+            self.llm, self.system_prompt,
+            recent_tokens=int(os.getenv("MEMORY_RECENT_TOKENS", "1200")),
+            summary_tokens=int(os.getenv("MEMORY_SUMMARY_TOKENS", "300")),
+        )
+
         # Exit phrases
         self.exit_phrases = [
             "wrap up", "done", "finish", "stop", "goodbye", "bye", "thank you", "thanks",
             "that's all", "i'm done", "end session", "see you", "take care"
         ]
 
+        # Only once everything above was built, so a failed setup (e.g. a
+        # missing voice model) doesn't leave a session "running" forever
+        self.store.create_session(self.session_id, source="live")
+
+    def status(self):
+        return {
+            "session_id": self.session_id,
+            "running": self.is_running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "turns": len(self.transcript),
+            "persona_ready": self.persona is not None,
+            "persona_extraction": self.extractor.stats(),
+            "timings": self.trace.summary(),
+            "memory": self.memory.stats(),
+            "speculation": self.speculator.stats() if self.speculator else None,
+        }
+
+    def draft_event(self):
+        """PERSONA_DRAFT event if the background draft changed since last sent."""
+        version, draft = self.extractor.snapshot()
+        if version <= self._draft_version_sent:
+            return None
+        self._draft_version_sent = version
+        return f"PERSONA_DRAFT: {json.dumps(draft)}"
+
+    def start_recording(self):
+        """Spill everything the microphone hears to disk until close() (RECORD_SESSIONS=1)."""
+        audio = getattr(self.stt, "audio", None)
+        if audio is not None and self.recording is None and os.getenv("RECORD_SESSIONS", "0") != "0":
+            self.recording = audio.record(self.recording_path)
+
+    def is_exit(self, user_text):
+        return any(phrase in user_text.lower() for phrase in self.exit_phrases)
+
+    def build_prompt(self):
+        return self.memory.prompt()
+
+    def record(self, role, text):
+        if role == "User":
+            TURNS.inc()
+        self.transcript.append(f"{role}: {text}")
+        self.memory.add(f"{role}: {text}")
+        self.store.append_turn(self.session_id, role, text)
+
+    def finalize(self):
+        """Save the transcript and build the persona (blocking)."""
+        self.store.flush()
+        os.makedirs(os.path.dirname(self.transcript_path), exist_ok=True)
+        with open(self.transcript_path, "w") as f:
+            f.write("\n".join(self.transcript))
+
+        # Only the turns since the last background update are left to extract
+        persona = self.extractor.finalize()
+        log.info("🧠 Persona finalized: %s", self.extractor.stats())
+        self.store.save_persona(self.session_id, persona)
+        save_json(persona, self.persona_path)
+        self.persona = persona
+        return persona
+
+    def close(self, status=None):
+        """Mark the session finished in the store (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self.is_running = False
+        self.finished_at = time.time()
+        status = status or ("complete" if self.persona else "incomplete")
+        self.store.finish_session(self.session_id, status)
+        self.memory.close()
+        self.extractor.close()
+        if self.recording is not None:
+            self.recording.close()
+        self.trace.close(status)
+
     def run(self) -> Generator[str, None, None]:
         """Run the onboarding and yield events in real-time."""
         self.is_running = True
+        self.start_recording()
         start_time = time.time()
 
         # Intro
-        self.tts.speak("Hey there! I'm Alex — your witty onboarding buddy. Ready for a fun 40-minute chat to build your AI twin? Just say 'start' when you're ready.")
+        self.tts.speak(phrases.INTRO, cache=True)
         yield "AI: Hey there! I'm Alex — your witty onboarding buddy..."
 
         # Wait for start
         user_ready = self.stt.listen(duration=10)
         if "no" in user_ready.lower():
-            self.tts.speak("No worries! Restart me when you're ready.")
+            self.tts.speak(phrases.NOT_READY, cache=True)
             yield "AI: No worries! Restart me when you're ready."
             self.is_running = False
             return
 
-        self.tts.speak("Awesome! Let's begin.")
+        self.tts.speak(phrases.BEGIN, cache=True)
         yield "AI: Awesome! Let's begin."
 
         # Main loop
         while self.is_running:
             if (time.time() - start_time) > 60 * 60:  # Max 60 mins
-                self.tts.speak("We've been chatting for a while — let me wrap up and build your AI twin.")
+                self.tts.speak(phrases.TIME_UP, cache=True)
                 yield "AI: Session complete. Generating your persona..."
                 break
 
             # Listen
+            self.trace.next_turn()
             user_text = self.stt.listen(duration=15)
             if not user_text.strip():
                 continue
 
-            self.transcript.append(f"User: {user_text}")
+            self.record("User", user_text)
             yield f"USER: {user_text}"
 
             # Check exit
-            if any(phrase in user_text.lower() for phrase in self.exit_phrases):
-                self.tts.speak("Got it! Thanks for such a great conversation. Let me generate your deep user persona now.")
+            if self.is_exit(user_text):
+                self.tts.speak(phrases.EXIT_ACK, cache=True)
                 yield "AI: Got it! Thanks for such a great conversation..."
                 break
 
             # Generate AI response
-            history = "\n".join(self.transcript[-6:])
-            prompt = f"{self.system_prompt}\n\n{history}\nAI:"
-            ai_response = self.llm.generate(prompt)
-            self.transcript.append(f"AI: {ai_response}")
+            prompt = self.build_prompt()
+            # Stream the reply: each finished sentence is spoken while the
+            # rest is still being generated
+            speech = self.tts.speak_async()
+            spoken = []
+            for sentence in stream_sentences(reply_stream(self.llm, prompt)):
+                speech.feed(sentence)
+                spoken.append(sentence)
+                yield f"AI_PARTIAL: {' '.join(spoken)}"
+            speech.finish()
 
-            # Speak
-            self.tts.speak(ai_response)
+            ai_response = " ".join(spoken)
+            self.record("AI", ai_response)
             yield f"AI: {ai_response}"
+            self.extractor.turn_completed()
+            speech.wait()
+
+            draft = self.draft_event()
+            if draft:
+                yield draft
 
             time.sleep(0.5)
 
         # Finalize
-        self.tts.speak("That was awesome! Let me build your deep user persona now.")
+        self.tts.speak(phrases.WRAP_UP, cache=True)
         yield "AI: Building your deep user persona..."
 
-        # Save transcript
-        os.makedirs(os.path.dirname(self.transcript_path), exist_ok=True)
-        with open(self.transcript_path, "w") as f:
-            f.write("\n".join(self.transcript))
-
-        # Build persona
-        builder = PersonaBuilder()
-        persona = builder.build("\n".join(self.transcript))
-        save_json(persona, self.persona_path)
+        # Save transcript and build persona
+        persona = self.finalize()
 
         self.is_running = False
-        self.tts.speak("Onboarding complete! Your AI twin now understands you deeply. Welcome aboard!")
+        self.tts.speak(phrases.COMPLETE, cache=True)
         yield f"PERSONA: {json.dumps(persona)}"
-        yield "DONE"
\ No newline at end of file
+        yield "DONE"
+
+    async def arun(self) -> AsyncGenerator[str, None]:
+        """Asyncio version of run(): same conversation, but capture and
+        transcription keep running while the AI talks, so the user can
+        interrupt, and nothing blocks the event loop."""
+        self.is_running = True
+        self.start_recording()
+        start_time = time.time()
+        pipeline = VoicePipeline(self.stt, self.tts, self.llm, speculator=self.speculator)
+
+        async with pipeline.running():
+            await pipeline.say(phrases.INTRO, cache=True)
+            yield "AI: Hey there! I'm Alex — your witty onboarding buddy..."
+
+            user_ready = await pipeline.next_transcript(timeout=10)
+            if "no" in user_ready.lower():
+                await pipeline.say(phrases.NOT_READY, cache=True)
+                yield "AI: No worries! Restart me when you're ready."
+                self.is_running = False
+                return
+
+            await pipeline.say(phrases.BEGIN, cache=True)
+            yield "AI: Awesome! Let's begin."
+
+            while self.is_running:
+                remaining = 60 * 60 - (time.time() - start_time)  # Max 60 mins
+                if remaining <= 0:
+                    await pipeline.say(phrases.TIME_UP, cache=True)
+                    yield "AI: Session complete. Generating your persona..."
+                    break
+
+                self.trace.next_turn()
+                user_text = await pipeline.next_transcript(timeout=remaining)
+                if not user_text.strip():
+                    continue
+
+                self.record("User", user_text)
+                yield f"USER: {user_text}"
+
+                if self.is_exit(user_text):
+                    await pipeline.say(phrases.EXIT_ACK, cache=True)
+                    yield "AI: Got it! Thanks for such a great conversation..."
+                    break
+
+                async for event in pipeline.respond(self.build_prompt(), user_text):
+                    yield event
+
+                ai_response = pipeline.last_response
+                if ai_response:
+                    self.record("AI", ai_response)
+                    yield f"AI: {ai_response}"
+                self.extractor.turn_completed()
+
+                draft = self.draft_event()
+                if draft:
+                    yield draft
+
+            await pipeline.say(phrases.WRAP_UP, cache=True)
+            yield "AI: Building your deep user persona..."
+
+            persona = await run_blocking(self.finalize)
+
+            self.is_running = False
+            await pipeline.say(phrases.COMPLETE, cache=True)
+            yield f"PERSONA: {json.dumps(persona)}"
+            yield "DONE"
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""Regenerate transcripts and personas for archived sessions in bulk.
+
+Takes WAV recordings and/or saved transcripts (files or directories) and
+writes a new session per input into the session store the API reads.
+Inputs that already have a complete session are skipped, so an interrupted
+run can simply be restarted; use --force after changing prompts or the
+persona schema.
+
+    python scripts/batch_reprocess.py recordings/ output/transcripts/ --workers 4 --llm-concurrency 3
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from modules.batch import BatchProcessor
+from modules.store import SessionStore, get_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="WAV/.txt files or directories containing them")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes (each loads its own Whisper model)")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM calls in flight across all workers")
+    parser.add_argument("--whisper", default=os.getenv("WHISPER_MODEL", "small"))
+    parser.add_argument("--db", help="Session store path (default: SESSION_DB / output/sessions.db)")
+    parser.add_argument("--force", action="store_true", help="Reprocess inputs that already have a complete session")
+    args = parser.parse_args()
+
+    store = SessionStore(args.db) if args.db else get_store()
+    processor = BatchProcessor(store=store, whisper_model=args.whisper, workers=args.workers,
+                               llm_concurrency=args.llm_concurrency, force=args.force)
+
+    def report(result, summary):
+        done = summary["complete"] + summary["failed"] + summary["errors"]
+        total = summary["inputs"] - summary["skipped"]
+        status = result.get("status", "error")
+        print(f"[{done}/{total}] {status:8s} {Path(result['path']).name} "
+              f"({summary['sessions_per_min']:.1f} sessions/min)")
+
+    summary = processor.run(args.inputs, on_result=report)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
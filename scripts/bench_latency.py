@@ -0,0 +1,328 @@
+"""End-to-end per-turn latency benchmark with stubbed audio and LLM backends.
+
+Drives OnboardingSession and ConversationEngine with WAV-file input, a null
+audio sink and a deterministic local LLM (by default also scripted Whisper
+and a silent Piper stand-in), and reports per-stage percentiles plus
+PersonaBuilder.build time across transcript sizes. Results are written as
+JSON so runs from different commits can be compared:
+
+    python scripts/bench_latency.py --synthetic 12 --llm-latency 0.4
+    python scripts/bench_latency.py --wavs recordings/ --whisper small --piper
+    python scripts/bench_latency.py --synthetic 12 --compare output/bench/<previous>.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from modules.fakes import NoQuestionIndex, NullSink, RealtimeNullSink, ScriptedWhisper, SilentVoice, WavInput
+from modules.llm import StubBot
+from modules.llm_client import LLMClient
+from modules.persona_builder import PersonaBuilder
+from modules.store import SessionStore
+from modules.stt import STT
+from modules.tts import TTS
+
+STAGES = ["capture", "transcribe", "prompt_build", "llm_first_token", "llm_total", "synthesis", "time_to_first_audio"]
+
+USER_LINES = [
+    "I spend most weekends hiking with my dog and taking photos of the trail.",
+    "Work has been stressful lately, I lead a small team at a logistics startup.",
+    "Honestly I think I value honesty and a bit of chaos in equal measure.",
+    "My dream is to open a tiny bakery by the sea someday.",
+    "I grew up in a big family so dinners were always loud and fun.",
+    "I'm trying to get better at saying no to things.",
+]
+
+PERSONA_REPLY = json.dumps({
+    "name": "Sam", "values": ["honesty", "curiosity"], "goals": ["open a bakery"],
+    "hobbies": ["hiking", "photography"], "lifestyle": "busy but outdoorsy",
+})
+
+
+class Recorder:
+    def __init__(self):
+        self.turns = []
+        self.current = None
+
+    def new_turn(self, **fields):
+        self.current = dict(fields)
+        self.turns.append(self.current)
+
+
+class TimedSTT:
+    """Wraps STT.listen: feeds the handshake/exit lines and records capture timings."""
+
+    def __init__(self, stt, source, recorder, start_phrase=None):
+        self.stt = stt
+        self.source = source
+        self.recorder = recorder
+        self.start_phrase = start_phrase
+
+    def listen(self, duration=8, sample_rate=16000):
+        if self.start_phrase:
+            phrase, self.start_phrase = self.start_phrase, None
+            return phrase
+        if self.source.exhausted:
+            return "That's all, let's wrap up."
+        text = self.stt.listen(duration, sample_rate)
+        timings = self.stt.last_timings
+        self.recorder.new_turn(
+            capture=self.source.capture_seconds,
+            transcribe=timings["transcribe"],
+            transcript_ready=time.perf_counter(),
+        )
+        return text
+
+    def __getattr__(self, name):
+        return getattr(self.stt, name)
+
+
+class TimedLLM:
+    def __init__(self, llm, recorder):
+        self.llm = llm
+        self.recorder = recorder
+
+    def generate(self, prompt):
+        return self.llm.generate(prompt)
+
+    def generate_stream(self, prompt):
+        start = time.perf_counter()
+        first = None
+        for token in self.llm.generate_stream(prompt):
+            if first is None:
+                first = time.perf_counter()
+            yield token
+        if self.recorder.current is not None:
+            self.recorder.current["llm_first_token"] = (first or time.perf_counter()) - start
+            self.recorder.current["llm_total"] = time.perf_counter() - start
+
+
+class TimedTTS:
+    def __init__(self, tts, recorder):
+        self.tts = tts
+        self.recorder = recorder
+
+    def speak_async(self, text=None, cache=False):
+        handle = self.tts.speak_async(text, cache=cache)
+        if text is None and self.recorder.current is not None:
+            self.recorder.current["handle"] = handle
+        return handle
+
+    def __getattr__(self, name):
+        return getattr(self.tts, name)
+
+
+def timed_method(obj, name, recorder):
+    original = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = original(*args, **kwargs)
+        if recorder.current is not None:
+            recorder.current["prompt_build"] = time.perf_counter() - start
+            recorder.current["prompt_chars"] = len(result)
+        return result
+
+    setattr(obj, name, wrapper)
+
+
+def synthetic_wavs(count, directory, rng):
+    paths = []
+    for i in range(count):
+        seconds = rng.uniform(1.5, 6.0)
+        t = np.arange(int(seconds * 16000)) / 16000
+        audio = 0.2 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+        audio = np.concatenate([np.zeros(4000), audio]) + 0.002 * rng.standard_normal(len(audio) + 4000)
+        path = Path(directory) / f"turn_{i:03d}.wav"
+        with wave.open(str(path), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+        path.with_suffix(".txt").write_text(USER_LINES[i % len(USER_LINES)], encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def build_components(args, wavs, recorder, start_phrase=None):
+    source = WavInput(wavs, realtime=args.realtime)
+    whisper = None if args.whisper else ScriptedWhisper(source=source, realtime_factor=args.stt_rtf)
+    stt = STT(model=args.whisper or whisper, source=source)
+    voice = None if args.piper else SilentVoice(realtime_factor=args.tts_rtf)
+    tts = TTS(voice=voice, sink=RealtimeNullSink if args.realtime else NullSink, cache=False)
+    if args.groq:
+        from modules.llm import MistralBot
+        llm = LLMClient(MistralBot())
+    else:
+        llm = LLMClient(StubBot(first_token_latency=args.llm_latency, token_latency=args.token_latency,
+                                prompt_token_latency=args.prompt_token_latency))
+    return TimedSTT(stt, source, recorder, start_phrase), TimedTTS(tts, recorder), TimedLLM(llm, recorder)
+
+
+def finish_turns(recorder):
+    rows = []
+    for turn in recorder.turns:
+        handle = turn.pop("handle", None)
+        if handle is not None:
+            handle.wait(30)
+            turn["synthesis"] = handle.synthesis_seconds
+            if handle.first_sample_at is not None:
+                turn["time_to_first_audio"] = handle.first_sample_at - turn["transcript_ready"]
+        turn.pop("transcript_ready", None)
+        rows.append(turn)
+    return rows
+
+
+def run_session(args, wavs, scratch):
+    from onboarding import OnboardingSession
+
+    recorder = Recorder()
+    stt, tts, llm = build_components(args, wavs, recorder, start_phrase="Yes, let's start!")
+    session = OnboardingSession(llm=llm, store=SessionStore(":memory:"), stt=stt, tts=tts)
+    session.transcript_path = os.path.join(scratch, "transcript.txt")
+    session.persona_path = os.path.join(scratch, "persona.json")
+    timed_method(session, "build_prompt", recorder)
+    for _ in session.run():
+        pass
+    return finish_turns(recorder)
+
+
+def run_conversation(args, wavs):
+    from modules.conversation import ConversationEngine
+
+    recorder = Recorder()
+    stt, tts, llm = build_components(args, wavs, recorder)
+    engine = ConversationEngine(llm=llm, stt=stt, tts=tts, question_index=NoQuestionIndex())
+    timed_method(engine, "get_context_prompt", recorder)
+    engine.run()
+    return finish_turns(recorder)
+
+
+def summarize(rows):
+    summary = {}
+    for stage in STAGES:
+        values = np.array([r[stage] for r in rows if stage in r], dtype=np.float64) * 1000
+        if not len(values):
+            continue
+        summary[stage] = {
+            "n": int(len(values)),
+            "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p90_ms": round(float(np.percentile(values, 90)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "max_ms": round(float(values.max()), 2),
+        }
+    return summary
+
+
+def bench_persona(args):
+    llm = StubBot(replies=[PERSONA_REPLY], first_token_latency=args.llm_latency,
+                  prompt_token_latency=args.prompt_token_latency)
+    builder = PersonaBuilder(llm=llm)
+    results = []
+    for turns in args.persona_sizes:
+        lines = []
+        for i in range(turns):
+            lines.append(f"User: {USER_LINES[i % len(USER_LINES)]}")
+            lines.append("AI: Ha, I love that. Tell me a little more about how that started for you?")
+        transcript = "\n".join(lines)
+        start = time.perf_counter()
+        persona = builder.build(transcript)
+        results.append({
+            "turns": turns,
+            "chars": len(transcript),
+            "seconds": round(time.perf_counter() - start, 4),
+            "ok": "error" not in persona,
+        })
+        print(f"🧠 PersonaBuilder.build: {turns} turns -> {results[-1]['seconds']}s")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nΔ vs {previous['meta']['revision']} ({previous_path})")
+    for engine in ("session", "conversation"):
+        for stage, now in current.get(engine, {}).items():
+            before = previous.get(engine, {}).get(stage)
+            if not before:
+                continue
+            delta = now["p50_ms"] - before["p50_ms"]
+            pct = 100 * delta / before["p50_ms"] if before["p50_ms"] else 0.0
+            print(f"  {engine:12s} {stage:20s} p50 {before['p50_ms']:9.2f} -> {now['p50_ms']:9.2f} ms ({pct:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wavs", help="Directory of WAV turns (optional .txt sidecars with the transcript)")
+    parser.add_argument("--synthetic", type=int, default=10, help="Generate N synthetic turns if --wavs is not given")
+    parser.add_argument("--engine", choices=["session", "conversation", "both"], default="both")
+    parser.add_argument("--whisper", help="Use a real Whisper model (e.g. small) instead of scripted STT")
+    parser.add_argument("--piper", action="store_true", help="Use the real Piper voice instead of a silent stand-in")
+    parser.add_argument("--groq", action="store_true", help="Use the real Groq LLM instead of StubBot")
+    parser.add_argument("--realtime", action="store_true", help="Pace capture and playback in real time")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="StubBot time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="StubBot per-token delay (s)")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0001, help="StubBot prefill delay per prompt token (s)")
+    parser.add_argument("--stt-rtf", type=float, default=0.1, help="Scripted STT compute per second of audio")
+    parser.add_argument("--tts-rtf", type=float, default=0.05, help="Silent voice compute per second of audio")
+    parser.add_argument("--persona-sizes", type=int, nargs="*", default=[10, 50, 200, 800])
+    parser.add_argument("--out", default="output/bench")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        wavs = sorted(Path(args.wavs).glob("*.wav")) if args.wavs else synthetic_wavs(args.synthetic, tmp, rng)
+
+        results = {"meta": {"revision": git_revision(), "timestamp": time.time(), "args": vars(args),
+                            "turns": len(wavs)}}
+        if args.engine in ("session", "both"):
+            rows = run_session(args, wavs, tmp)
+            results["session"] = summarize(rows)
+            results["session_turns"] = rows
+        if args.engine in ("conversation", "both"):
+            rows = run_conversation(args, wavs)
+            results["conversation"] = summarize(rows)
+            results["conversation_turns"] = rows
+
+    if args.persona_sizes:
+        results["persona_build"] = bench_persona(args)
+
+    for engine in ("session", "conversation"):
+        if engine in results:
+            print(f"\n⏱️ {engine}")
+            for stage, stats in results[engine].items():
+                print(f"  {stage:20s} p50 {stats['p50_ms']:9.2f}  p90 {stats['p90_ms']:9.2f}  max {stats['max_ms']:9.2f} ms")
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"latency_{results['meta']['revision']}_{int(results['meta']['timestamp'])}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Saved {path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
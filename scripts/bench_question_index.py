@@ -0,0 +1,106 @@
+"""Benchmark question matching over a large synthetic question bank.
+
+Compares the old linear substring scan with the NumPy and FAISS indexes.
+Embeddings are random unit vectors unless --encode is given, in which case
+the real sentence encoder is used for the query (bank stays synthetic).
+
+    python scripts/bench_question_index.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.question_index import QuestionIndex
+
+TOPICS = ["travel", "pets", "work stress", "cooking", "music", "fitness", "gaming", "parenting",
+          "books", "startups", "gardening", "photography", "hiking", "coffee", "languages"]
+
+
+def synthetic_bank(size):
+    bank = []
+    for i in range(size):
+        topic = TOPICS[i % len(TOPICS)]
+        bank.append({
+            "type": "personalized",
+            "trigger": f"mentions {topic} {i}",
+            "question": f"Question {i}: tell me more about your {topic}?",
+        })
+    return bank
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3)}
+
+
+def time_queries(fn, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--encode", action="store_true", help="Include real query encoding time")
+    parser.add_argument("--json", help="Write results to this path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    for size in args.sizes:
+        bank = synthetic_bank(size)
+        vectors = rng.standard_normal((size, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        # Persist and memory-map, as at runtime
+        with tempfile.TemporaryDirectory() as tmp:
+            QuestionIndex(vectors, bank).save(tmp)
+            index = QuestionIndex.load(tmp)
+            # Memory-mapped if this FAISS build supports it, else in memory for comparison
+            faiss_index = index._faiss if index._faiss is not None else QuestionIndex._build_faiss(vectors)
+            row = {"size": size}
+
+            query_vectors = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+            query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+            texts = [f"I just got back from a trip, {TOPICS[i % len(TOPICS)]} is my thing"
+                     for i in range(args.queries)]
+
+            # Old behaviour: substring check of every trigger against the turn text
+            def linear(text):
+                return next((q for q in bank if q["trigger"] in text.lower()), None)
+
+            row["linear_scan"] = time_queries(linear, texts)
+
+            index._faiss = None
+            row["numpy"] = time_queries(lambda v: index.search(v, 5), query_vectors)
+            if faiss_index is not None:
+                index._faiss = faiss_index
+                row["faiss"] = time_queries(lambda v: index.search(v, 5), query_vectors)
+
+            if args.encode:
+                index.encode(["warm up"])
+                row["encode_and_search"] = time_queries(lambda t: index.search(index.encode([t])[0], 5), texts)
+
+        results.append(row)
+        print(json.dumps(row))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
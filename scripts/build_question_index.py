@@ -0,0 +1,38 @@
+"""Embed the personalized questions in the question bank and persist the index.
+
+    python scripts/build_question_index.py [--bank prompts/question_bank.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from modules.question_index import DEFAULT_INDEX_DIR, DEFAULT_MODEL, QuestionIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bank", default="prompts/question_bank.json")
+    parser.add_argument("--out", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    with open(args.bank, "r", encoding="utf-8") as f:
+        bank = json.load(f)
+
+    start = time.perf_counter()
+    index = QuestionIndex.build(bank, args.model)
+    index.save(args.out)
+    print(f"✅ Indexed {len(index.questions)} personalized questions "
+          f"({index.embeddings.shape[1] if len(index.questions) else 0}-d) in "
+          f"{time.perf_counter() - start:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare Whisper model sizes and CPU precisions on a WAV corpus.
+
+Each WAV may have a reference transcript next to it (same name, .txt); with
+references the report includes word error rate, otherwise only latency.
+Every model/precision combination is loaded in turn, warmed up, and run
+over the whole corpus:
+
+    python scripts/compare_whisper.py recordings/ --models tiny base small --precisions fp32 int8 --threads 4
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from modules.utils import load_wav
+from modules.whisper_backend import PRECISIONS, WhisperRunner, load_whisper
+
+
+def normalize(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two token lists."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1]
+
+
+def load_corpus(directory, limit=None):
+    corpus = []
+    for path in sorted(Path(directory).glob("*.wav"))[:limit]:
+        sidecar = path.with_suffix(".txt")
+        reference = sidecar.read_text(encoding="utf-8").strip() if sidecar.exists() else None
+        corpus.append((path.name, load_wav(path, 16000), reference))
+    return corpus
+
+
+def evaluate(name, precision, corpus, threads, greedy):
+    start = time.perf_counter()
+    runner = WhisperRunner(load_whisper(name, precision, threads), greedy=greedy)
+    load_seconds = time.perf_counter() - start
+    runner.transcribe(np.zeros(16000, dtype=np.float32))  # warm-up
+
+    latencies, errors, words, audio_seconds = [], 0, 0, 0.0
+    for _, audio, reference in corpus:
+        start = time.perf_counter()
+        text = runner.transcribe(audio)["text"]
+        latencies.append(time.perf_counter() - start)
+        audio_seconds += len(audio) / 16000
+        if reference is not None:
+            ref_words = normalize(reference)
+            errors += word_errors(ref_words, normalize(text))
+            words += len(ref_words)
+
+    latencies = np.array(latencies)
+    return {
+        "model": name,
+        "precision": precision,
+        "load_seconds": round(load_seconds, 2),
+        "mean_ms": round(float(latencies.mean()) * 1000, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p90_ms": round(float(np.percentile(latencies, 90)) * 1000, 1),
+        "real_time_factor": round(float(latencies.sum()) / audio_seconds, 3) if audio_seconds else None,
+        "wer": round(errors / words, 4) if words else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of 16 kHz (or any rate) WAV files with optional .txt references")
+    parser.add_argument("--models", nargs="+", default=["base", "small"])
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--threads", type=int, help="torch thread count (default: torch's choice)")
+    parser.add_argument("--greedy", action="store_true", help="Single temperature-0 pass (WHISPER_GREEDY=1)")
+    parser.add_argument("--limit", type=int, help="Only use the first N files")
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    if not corpus:
+        sys.exit(f"No WAV files in {args.corpus}")
+    print(f"🎧 {len(corpus)} files, {sum(len(a) for _, a, _ in corpus) / 16000:.0f}s of audio")
+
+    results = []
+    for name in args.models:
+        for precision in args.precisions:
+            result = evaluate(name, precision, corpus, args.threads, args.greedy)
+            results.append(result)
+            wer = f"{result['wer']:.2%}" if result["wer"] is not None else "n/a"
+            print(f"{name:>8s} {precision:5s}  load {result['load_seconds']:5.1f}s  "
+                  f"p50 {result['p50_ms']:7.1f} ms  p90 {result['p90_ms']:7.1f} ms  "
+                  f"RTF {result['real_time_factor']}  WER {wer}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"threads": args.threads, "greedy": args.greedy, "results": results}, f, indent=2)
+        print(f"💾 Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Pre-render fixed phrases and question-bank questions into the TTS cache.
+
+Run once per deployment (or after changing the voice / synthesis params) so
+that the first session already gets cache hits for every static line:
+
+    python scripts/prerender_tts.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from modules import phrases
+from modules.tts import DEFAULT_VOICE, TTS
+
+
+def static_texts(question_bank):
+    texts = list(phrases.ALL)
+    with open(question_bank, "r", encoding="utf-8") as f:
+        texts.extend(q["question"] for q in json.load(f))
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voice", default=DEFAULT_VOICE)
+    parser.add_argument("--question-bank", default="prompts/question_bank.json")
+    parser.add_argument("--length-scale", type=float, help="Piper length_scale (must match runtime)")
+    args = parser.parse_args()
+
+    params = {"length_scale": args.length_scale} if args.length_scale else None
+    tts = TTS(model_path=args.voice, synthesis_params=params)
+    if tts.cache is None:
+        print("❌ TTS cache is disabled")
+        return
+
+    texts = static_texts(args.question_bank)
+    start = time.perf_counter()
+    rendered = cached = 0
+    for text in texts:
+        before = tts.cache.stats()["hits"]
+        result = tts.render(text, cache=True)
+        if result is None:
+            print(f"❌ No audio for: {text}")
+            continue
+        if tts.cache.stats()["hits"] > before:
+            cached += 1
+        else:
+            rendered += 1
+            print(f"🎙️ Rendered {len(result[1]) / result[0]:.1f}s: {text[:60]}")
+
+    print(f"✅ {rendered} rendered, {cached} already cached in {time.perf_counter() - start:.1f}s "
+          f"({tts.cache.stats()['disk_bytes'] / 1e6:.1f} MB on disk)")
+
+
+if __name__ == "__main__":
+    main()
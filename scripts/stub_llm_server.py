@@ -0,0 +1,104 @@
+"""Stand-in OpenAI-compatible LLM server backed by StubBot, with fault injection.
+
+Lets the whole LLM client path (HTTP, streaming, timeouts, retries,
+hedging, fallback) be exercised offline:
+
+    python scripts/stub_llm_server.py --port 8090 --fail-rate 0.2 --slow-rate 0.1
+    LLM_BACKEND=http://127.0.0.1:8090/v1 LLM_FALLBACK=stub LLM_HEDGE_MS=800 uvicorn main:app
+
+`--fail-rate` answers that share of requests with HTTP 503 (or 429 with
+Retry-After when `--rate-limited` is set); `--slow-rate` delays that share
+by `--slow-seconds` before the first token.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from modules.llm import StubBot
+
+
+def make_handler(bot, args):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like a real server
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": "not found"})
+            if random.random() < args.fail_rate:
+                if args.rate_limited:
+                    return self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                return self._send(503, {"error": "overloaded"})
+            if random.random() < args.slow_rate:
+                time.sleep(args.slow_seconds)
+
+            prompt = request["messages"][-1]["content"]
+            if not request.get("stream"):
+                message = {"role": "assistant", "content": bot.generate(prompt)}
+                return self._send(200, {"choices": [{"index": 0, "message": message}]})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in bot.generate_stream(prompt):
+                self._chunk({"choices": [{"index": 0, "delta": {"content": token}}]})
+            self._chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, payload):
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limited", action="store_true", help="Fail with 429 + Retry-After instead of 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-seconds", type=float, default=5.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    bot = StubBot(first_token_latency=args.first_token_latency, token_latency=args.token_latency)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(bot, args))
+    print(f"🤖 Stub LLM server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
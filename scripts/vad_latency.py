@@ -0,0 +1,140 @@
+"""Measure VAD endpointing latency offline against recorded WAV files.
+
+Each file is replayed frame by frame through the same EnergyVAD used by
+STT.listen, followed by trailing silence (as if the user stopped talking),
+and compared with the old fixed-duration recording.
+
+    python scripts/vad_latency.py recordings/ --transcribe --model small
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.utils import load_wav
+from modules.vad import EnergyVAD, endpoint
+
+SAMPLE_RATE = 16000
+
+
+def collect_wavs(paths):
+    files = []
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            files.extend(sorted(p.glob("*.wav")))
+        else:
+            files.append(p)
+    return files
+
+
+def measure(path, vad_config, fixed_duration, tail_silence, model=None):
+    speech = load_wav(path, SAMPLE_RATE)
+    audio = np.concatenate([speech, np.zeros(int(tail_silence * SAMPLE_RATE), dtype=np.float32)])
+    speech_end = len(speech) / SAMPLE_RATE
+
+    vad = EnergyVAD(sample_rate=SAMPLE_RATE, **vad_config)
+    max_samples = int(fixed_duration * SAMPLE_RATE)
+    trimmed, stop_at = endpoint(audio[:max_samples], vad)
+    endpoint_s = stop_at / SAMPLE_RATE
+
+    row = {
+        "file": str(path),
+        "speech_seconds": round(speech_end, 3),
+        "endpoint_seconds": round(endpoint_s, 3),
+        "endpoint_lag": round(endpoint_s - speech_end, 3),
+        "trimmed_seconds": round(len(trimmed) / SAMPLE_RATE, 3),
+        "detected": vad.ended,
+        # With fixed-duration capture the turn ends at `fixed_duration` no matter what
+        "fixed_wait": round(max(0.0, fixed_duration - speech_end), 3),
+    }
+
+    if model is not None:
+        t0 = time.perf_counter()
+        text = model.transcribe(trimmed, fp16=False)["text"].strip() if len(trimmed) else ""
+        vad_asr = time.perf_counter() - t0
+
+        fixed_audio = np.zeros(max_samples, dtype=np.float32)
+        fixed_audio[:min(len(audio), max_samples)] = audio[:max_samples]
+        t0 = time.perf_counter()
+        model.transcribe(fixed_audio, fp16=False)
+        fixed_asr = time.perf_counter() - t0
+
+        row.update({
+            "text": text,
+            "vad_transcribe": round(vad_asr, 3),
+            "fixed_transcribe": round(fixed_asr, 3),
+            "vad_turn_latency": round(max(0.0, endpoint_s - speech_end) + vad_asr, 3),
+            "fixed_turn_latency": round(row["fixed_wait"] + fixed_asr, 3),
+        })
+    return row
+
+
+def summarize(rows, key):
+    values = np.array([r[key] for r in rows if key in r], dtype=np.float64)
+    if not len(values):
+        return None
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="WAV files or directories of WAV files")
+    parser.add_argument("--threshold", type=float, default=0.015)
+    parser.add_argument("--frame-ms", type=int, default=30)
+    parser.add_argument("--min-speech-ms", type=int, default=150)
+    parser.add_argument("--trailing-silence-ms", type=int, default=700)
+    parser.add_argument("--fixed-duration", type=float, default=15.0,
+                        help="Old fixed recording length, also the VAD upper bound")
+    parser.add_argument("--tail-silence", type=float, default=3.0,
+                        help="Seconds of silence appended after each recording")
+    parser.add_argument("--transcribe", action="store_true", help="Also time Whisper on trimmed vs fixed audio")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--json", help="Write per-file results to this path")
+    args = parser.parse_args()
+
+    vad_config = {
+        "frame_ms": args.frame_ms,
+        "threshold": args.threshold,
+        "min_speech_ms": args.min_speech_ms,
+        "trailing_silence_ms": args.trailing_silence_ms,
+    }
+
+    model = None
+    if args.transcribe:
+        import whisper
+        model = whisper.load_model(args.model)
+
+    rows = []
+    for path in collect_wavs(args.paths):
+        row = measure(path, vad_config, args.fixed_duration, args.tail_silence, model)
+        rows.append(row)
+        print(f"{os.path.basename(row['file'])}: speech {row['speech_seconds']}s, "
+              f"endpoint +{row['endpoint_lag']}s, kept {row['trimmed_seconds']}s")
+
+    if not rows:
+        print("No WAV files found.")
+        return
+
+    summary = {k: summarize(rows, k) for k in
+               ("endpoint_lag", "fixed_wait", "vad_turn_latency", "fixed_turn_latency")}
+    summary = {k: v for k, v in summary.items() if v is not None}
+    print(json.dumps({"files": len(rows), "vad": vad_config, "summary": summary}, indent=2))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vad_config, "summary": summary, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Load generator for the /ws/audio endpoint: many simulated remote users at once.
+
+Each user opens a WebSocket session and acts like a microphone. It streams
+audio in real time, silence between turns, and each WAV as one turn after
+the AI has finished speaking. Per turn it measures the time from the end
+of the user's speech to the transcript event and to the first reply audio.
+Raise --users until latency or rejections say the server is full:
+
+    python scripts/ws_load.py recordings/ --users 8 --ramp 10
+    python scripts/ws_load.py recordings/ --users 16 --encoding mulaw --out output/bench/ws_16.json
+
+The first WAV answers the intro ("start"); end the list with a wrap-up
+phrase to get through persona building, or use --turns to stop early.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+import websockets
+
+from modules.remote_audio import ENCODINGS, encode_audio
+from modules.utils import load_wav
+
+FRAME_MS = 20
+
+
+class User:
+    def __init__(self, index, args, turns):
+        self.index = index
+        self.args = args
+        self.turns = turns
+        self.rate = args.sample_rate
+        self.frame = int(self.rate * FRAME_MS / 1000)
+        self.rng = np.random.default_rng(index)
+
+        self.status = "pending"
+        self.results = []
+        self.server_stats = None
+        self.error = None
+        self.audio_seconds = 0.0
+        self.output_rate = 22050
+        self.ai_speaking = False
+        self.last_audio_end = time.monotonic()
+        self.speech_ended_at = None
+        self.current = None
+        self._replied = asyncio.Event()
+
+    def _silence(self):
+        # A little noise so the server's VAD sees a realistic floor
+        return (self.rng.standard_normal(self.frame) * 0.002).astype(np.float32)
+
+    async def _mic(self, ws, pending):
+        """Stream one frame every FRAME_MS: turn audio when there is some, silence otherwise."""
+        start = time.monotonic()
+        sent = 0
+        utterance, position = None, 0
+        while True:
+            if utterance is None and not pending.empty():
+                utterance, position = pending.get_nowait(), 0
+            if utterance is not None:
+                frame = utterance[position:position + self.frame]
+                position += self.frame
+                if position >= len(utterance):
+                    utterance = None
+                    self.speech_ended_at = time.monotonic()
+                if len(frame) < self.frame:
+                    frame = np.concatenate([frame, self._silence()[:self.frame - len(frame)]])
+            else:
+                frame = self._silence()
+            await ws.send(encode_audio(frame, self.args.encoding))
+            sent += 1
+            await asyncio.sleep(max(0.0, start + sent * FRAME_MS / 1000 - time.monotonic()))
+
+    async def _receive(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                self.audio_seconds += len(message) / 2 / self.output_rate  # PCM16
+                continue
+            message = json.loads(message)
+            kind = message["type"]
+            now = time.monotonic()
+            if kind == "audio_start":
+                self.output_rate = message["sample_rate"]
+                self.ai_speaking = True
+                if self.current is not None and "first_audio_s" not in self.current and self.speech_ended_at:
+                    self.current["first_audio_s"] = now - self.speech_ended_at
+                    self._replied.set()
+            elif kind in ("audio_end", "clear"):
+                self.ai_speaking = False
+                self.last_audio_end = now
+            elif kind == "event":
+                data = message["data"]
+                if data.startswith("USER:") and self.current is not None and self.speech_ended_at:
+                    self.current.setdefault("transcript_s", now - self.speech_ended_at)
+                    self.current["text"] = data[5:].strip()
+                elif data == "DONE":
+                    self.status = "done"
+            elif kind == "error":
+                self.status = "rejected" if message.get("status") == 429 else "error"
+                self.error = message.get("detail")
+            elif kind == "stats":
+                self.server_stats = message
+
+    async def _quiet(self, seconds, timeout):
+        """Wait until the AI has been silent for `seconds` (False on timeout)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.ai_speaking and time.monotonic() - self.last_audio_end >= seconds:
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    async def run(self, url):
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                self.status = "connected"
+                pending = asyncio.Queue()
+                tasks = [asyncio.create_task(self._mic(ws, pending)), asyncio.create_task(self._receive(ws))]
+                try:
+                    await self._converse(pending, tasks[1])
+                    await ws.send(json.dumps({"type": "stop"}))
+                    await asyncio.wait_for(asyncio.shield(tasks[1]), self.args.turn_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+        except Exception as e:
+            if self.status in ("pending", "connected"):
+                self.status = "error"
+                self.error = f"{type(e).__name__}: {e}"
+
+    async def _converse(self, pending, receiver):
+        # Let the intro play out first
+        await self._quiet(self.args.pause, self.args.turn_timeout)
+        for audio in self.turns:
+            if receiver.done() or self.status in ("rejected", "error", "done"):
+                return
+            self.current = {"user": self.index, "audio_s": round(len(audio) / self.rate, 2)}
+            self.speech_ended_at = None
+            self._replied.clear()
+            self.results.append(self.current)
+            await pending.put(audio)
+            try:
+                await asyncio.wait_for(self._replied.wait(), self.args.turn_timeout)
+            except asyncio.TimeoutError:
+                self.current["timeout"] = True
+                continue
+            await self._quiet(self.args.pause, self.args.turn_timeout)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.array(values) * 1000
+    return {"n": len(values), "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p90_ms": round(float(np.percentile(values, 90)), 1),
+            "p99_ms": round(float(np.percentile(values, 99)), 1), "max_ms": round(float(values.max()), 1)}
+
+
+async def run_load(args, turns):
+    url = f"{args.url}?encoding={args.encoding}&sample_rate={args.sample_rate}"
+    users = [User(i, args, turns) for i in range(args.users)]
+    start = time.monotonic()
+
+    async def launch(user):
+        await asyncio.sleep(args.ramp * user.index / max(1, args.users - 1) if args.users > 1 else 0)
+        await user.run(url)
+
+    await asyncio.gather(*(launch(u) for u in users))
+    elapsed = time.monotonic() - start
+
+    rows = [r for u in users for r in u.results]
+    statuses = {}
+    for user in users:
+        statuses[user.status] = statuses.get(user.status, 0) + 1
+    stalled = [u.server_stats["input"]["stalled_seconds"] for u in users if u.server_stats]
+    return {
+        "users": args.users,
+        "elapsed_seconds": round(elapsed, 1),
+        "statuses": statuses,
+        "turns": len(rows),
+        "timeouts": sum(1 for r in rows if r.get("timeout")),
+        "transcript": percentiles([r["transcript_s"] for r in rows if "transcript_s" in r]),
+        "first_audio": percentiles([r["first_audio_s"] for r in rows if "first_audio_s" in r]),
+        "audio_received_seconds": round(sum(u.audio_seconds for u in users), 1),
+        "input_stalled_seconds": round(sum(stalled), 2),
+        "errors": [u.error for u in users if u.error][:10],
+        "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("wavs", nargs="+", help="WAV files or directories, replayed in order as turns")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/audio")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which users connect")
+    parser.add_argument("--turns", type=int, help="Only replay the first N WAVs")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="pcm16")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="Rate audio is sent at")
+    parser.add_argument("--pause", type=float, default=0.8, help="Silence after the AI stops before the next turn")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    paths = []
+    for item in args.wavs:
+        path = Path(item)
+        paths.extend(sorted(path.glob("*.wav")) if path.is_dir() else [path])
+    turns = [load_wav(p, args.sample_rate) for p in paths[:args.turns]]
+    if not turns:
+        sys.exit("No WAV files given")
+    print(f"🎧 {args.users} users x {len(turns)} turns ({sum(len(t) for t in turns) / args.sample_rate:.0f}s of audio each)")
+
+    results = asyncio.run(run_load(args, turns))
+    print(f"👥 {results['statuses']} in {results['elapsed_seconds']}s, "
+          f"{results['turns']} turns, {results['timeouts']} timed out")
+    for name in ("transcript", "first_audio"):
+        stats = results[name]
+        if stats:
+            print(f"  {name:12s} p50 {stats['p50_ms']:8.1f}  p90 {stats['p90_ms']:8.1f}  "
+                  f"p99 {stats['p99_ms']:8.1f}  max {stats['max_ms']:8.1f} ms  (n={stats['n']})")
+    if results["input_stalled_seconds"]:
+        print(f"  ⚠️ server held back client audio for {results['input_stalled_seconds']}s in total")
+    for error in results["errors"]:
+        print(f"  ❌ {error}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Run from anywhere: the tests import the app's modules/ and scripts/
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
@@ -0,0 +1,198 @@
+"""LLMClient against StubBot and the stub server, with injected failures.
+
+Offline and quick: backoffs and deadlines are scaled down to fractions of
+a second.
+"""
+import threading
+import time
+from argparse import Namespace
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from modules.llm import OpenAICompatibleBot, StubBot
+from modules.llm_client import LLMClient, LLMError, LLMHTTPError, RateLimiter
+
+REPLY = "Hello there. How are you today?"
+FALLBACK_REPLY = "Sorry, the main model is busy."
+
+
+class ScriptedBot(StubBot):
+    """StubBot whose calls fail or stall as scripted, one step per call.
+
+    A step is an HTTP status to fail with (429 carries Retry-After), a
+    number of seconds to stall before the first token, "drop" to fail after
+    the first token, or None for a normal reply. Calls past the end of the
+    script reply normally.
+    """
+
+    def __init__(self, script=(), retry_after="0.3"):
+        super().__init__(replies=[REPLY])
+        self.script = list(script)
+        self.retry_after = retry_after
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_stream(self, prompt):
+        with self._lock:
+            self.calls += 1
+            step = self.script.pop(0) if self.script else None
+        if step == 429:
+            raise LLMHTTPError(429, "rate limited", {"retry-after": self.retry_after})
+        if isinstance(step, int):
+            raise LLMHTTPError(step, "scripted failure")
+        if isinstance(step, float):
+            time.sleep(step)
+        for i, token in enumerate(super().generate_stream(prompt)):
+            if i and step == "drop":
+                raise ConnectionError("connection reset")
+            yield token
+
+
+def client(bot, **kwargs):
+    kwargs = {"retries": 2, "backoff": 0.01, "max_backoff": 0.05, "first_token_timeout": 2.0,
+              "timeout": 5.0, **kwargs}
+    return LLMClient(bot, **kwargs)
+
+
+def test_retries_transient_errors():
+    bot = ScriptedBot([503, 502])
+    llm = client(bot)
+    assert llm.generate("hi") == REPLY
+    assert bot.calls == 3
+    assert llm.stats()["retries"] == 2
+
+
+def test_gives_up_after_retries():
+    bot = ScriptedBot([503, 503, 503])
+    llm = client(bot)
+    with pytest.raises(LLMError, match="unavailable"):
+        llm.generate("hi")
+    assert bot.calls == 3
+    assert llm.stats()["failures"] == 1
+
+
+def test_client_errors_are_not_retried():
+    bot = ScriptedBot([400])
+    llm = client(bot)
+    with pytest.raises(LLMError):
+        llm.generate("hi")
+    assert bot.calls == 1
+
+
+def test_honours_retry_after():
+    bot = ScriptedBot([429], retry_after="0.3")
+    llm = client(bot, max_backoff=1.0)
+    start = time.monotonic()
+    assert llm.generate("hi") == REPLY
+    assert time.monotonic() - start >= 0.3
+
+
+def test_retry_after_is_capped_by_max_backoff():
+    bot = ScriptedBot([429], retry_after="30")
+    llm = client(bot, max_backoff=0.05)
+    start = time.monotonic()
+    assert llm.generate("hi") == REPLY
+    assert time.monotonic() - start < 1.0
+
+
+def test_first_token_deadline_retries_a_stalled_request():
+    bot = ScriptedBot([1.0])
+    llm = client(bot, first_token_timeout=0.1)
+    start = time.monotonic()
+    assert llm.generate("hi") == REPLY
+    assert time.monotonic() - start < 1.0
+    assert llm.stats()["retries"] == 1
+
+
+def test_hedge_beats_a_slow_first_attempt():
+    bot = ScriptedBot([1.0])
+    llm = client(bot, hedge_after=0.05)
+    start = time.monotonic()
+    assert llm.generate("hi") == REPLY
+    assert time.monotonic() - start < 1.0
+    stats = llm.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["retries"]) == (1, 1, 0)
+
+
+def test_no_hedge_when_the_first_token_is_on_time():
+    llm = client(ScriptedBot(), hedge_after=0.5)
+    assert llm.generate("hi") == REPLY
+    assert llm.stats()["hedges"] == 0
+
+
+def test_falls_back_once_the_primary_gives_up():
+    llm = client(ScriptedBot([503, 503]), retries=1, fallback=StubBot(replies=[FALLBACK_REPLY]))
+    assert llm.generate("hi") == FALLBACK_REPLY
+    stats = llm.stats()
+    assert (stats["fallbacks"], stats["failures"]) == (1, 0)
+
+
+def test_nothing_is_retried_after_the_first_token():
+    bot = ScriptedBot(["drop"])
+    llm = client(bot, fallback=StubBot(replies=[FALLBACK_REPLY]))
+    tokens = []
+    with pytest.raises(LLMError, match="mid-reply"):
+        for token in llm.generate_stream("hi"):
+            tokens.append(token)
+    assert tokens == ["Hello"]
+    assert bot.calls == 1
+    assert llm.stats()["fallbacks"] == 0
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(per_minute=600, burst=1)  # One every 0.1s
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.01)
+    start = time.monotonic()
+    assert limiter.acquire(timeout=1.0)
+    assert time.monotonic() - start >= 0.05
+
+
+def test_client_requests_wait_for_the_rate_limiter():
+    llm = client(ScriptedBot())
+    llm.rate = RateLimiter(per_minute=600, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        assert llm.generate("hi") == REPLY
+    assert time.monotonic() - start >= 0.15
+
+
+@pytest.fixture
+def stub_server():
+    """Start scripts/stub_llm_server.py in-process; yields a function of its fault settings."""
+    from scripts.stub_llm_server import make_handler
+
+    servers = []
+
+    def start(fail_rate=0.0, rate_limited=False, slow_rate=0.0, slow_seconds=0.0):
+        args = Namespace(fail_rate=fail_rate, rate_limited=rate_limited, slow_rate=slow_rate,
+                         slow_seconds=slow_seconds, verbose=False)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(StubBot(replies=[REPLY]), args))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_streams_from_the_stub_server(stub_server):
+    llm = client(OpenAICompatibleBot(stub_server()))
+    assert "".join(llm.generate_stream("hi")) == REPLY
+
+
+def test_stub_server_rate_limit_falls_back(stub_server):
+    bot = OpenAICompatibleBot(stub_server(fail_rate=1.0, rate_limited=True))
+    llm = client(bot, retries=1, fallback=StubBot(replies=[FALLBACK_REPLY]))
+    assert llm.generate("hi") == FALLBACK_REPLY
+    stats = llm.stats()
+    assert (stats["retries"], stats["fallbacks"]) == (1, 1)
+
+
+def test_stub_server_slow_reply_hits_the_first_token_deadline(stub_server):
+    bot = OpenAICompatibleBot(stub_server(slow_rate=1.0, slow_seconds=1.0))
+    llm = client(bot, retries=0, first_token_timeout=0.1, fallback=StubBot(replies=[FALLBACK_REPLY]))
+    assert llm.generate("hi") == FALLBACK_REPLY
@@ -0,0 +1,77 @@
+"""Sentence segmentation of streamed LLM replies, against StubBot as the streaming model."""
+from modules import phrases
+from modules.llm import StubBot, reply_stream
+from modules.llm_client import LLMHTTPError
+from modules.segmenter import SentenceSegmenter, stream_sentences
+
+
+def tokens(text):
+    """Split text into word tokens the way StubBot streams them."""
+    words = text.split(" ")
+    return [words[0]] + [f" {word}" for word in words[1:]]
+
+
+def test_emits_a_sentence_once_the_next_token_starts():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("That sounds like fun.") == []  # Could still be "fun.." or a quote
+    assert segmenter.feed(" What") == ["That sounds like fun."]
+    assert segmenter.flush() == "What"
+
+
+def test_holds_back_short_sentences_and_abbreviations():
+    text = "Ha! I met Dr. Smith at the park today. Nice."
+    assert list(stream_sentences(tokens(text))) == ["Ha! I met Dr. Smith at the park today.", "Nice."]
+
+
+def test_keeps_closing_quotes_with_their_sentence():
+    text = 'She said "let\'s go hiking today." Then we left.'
+    assert list(stream_sentences(tokens(text))) == ['She said "let\'s go hiking today."', "Then we left."]
+
+
+def test_flush_returns_the_unterminated_tail():
+    segmenter = SentenceSegmenter()
+    segmenter.feed("no punctuation at all")
+    assert segmenter.flush() == "no punctuation at all"
+    assert segmenter.flush() == ""
+
+
+def test_streams_a_stub_reply_sentence_by_sentence():
+    reply = "That's a great answer. What does a really good day look like for you?"
+    sentences = list(stream_sentences(reply_stream(StubBot(replies=[reply]), "hi")))
+    assert sentences == ["That's a great answer.", "What does a really good day look like for you?"]
+
+
+def test_first_sentence_arrives_before_the_reply_ends():
+    reply = "I love long walks by the sea. Tell me about the places you like to go most."
+    consumed = []
+
+    def counting(stream):
+        for token in stream:
+            consumed.append(token)
+            yield token
+
+    sentences = stream_sentences(counting(StubBot(replies=[reply]).generate_stream("hi")))
+    assert next(sentences) == "I love long walks by the sea."
+    assert len(consumed) < len(tokens(reply))
+
+
+class FailingBot:
+    """Streams `good` tokens, then fails like an overloaded server."""
+
+    def __init__(self, good=()):
+        self.good = list(good)
+
+    def generate_stream(self, prompt):
+        yield from self.good
+        raise LLMHTTPError(503, "overloaded")
+
+
+def test_a_failed_reply_is_spoken_as_an_apology():
+    sentences = list(stream_sentences(reply_stream(FailingBot(), "hi")))
+    assert " ".join(sentences) == phrases.LLM_APOLOGY
+
+
+def test_a_reply_failing_midway_keeps_what_was_said():
+    sentences = list(stream_sentences(reply_stream(FailingBot(tokens("Okay, let me think about that.")), "hi")))
+    assert sentences[0] == "Okay, let me think about that."
+    assert " ".join(sentences[1:]) == phrases.LLM_APOLOGY